@@ -1 +1,3 @@
 from .manager       import ReallySimpleDB as dbmanager
+from .async_manager import AsyncReallySimpleDB as asyncdbmanager
+from .sharded_manager import ShardedReallySimpleDB as shardeddbmanager
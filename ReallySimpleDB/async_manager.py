@@ -0,0 +1,171 @@
+import asyncio
+
+from itertools          import islice
+from contextlib         import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from .manager   import ReallySimpleDB
+
+class AsyncReallySimpleDB:
+    """
+    AsyncReallySimpleDB class.
+
+    AsyncReallySimpleDB objects have the same methods as ReallySimpleDB objects, as
+    coroutines. all the calls run on one executor thread, so sqlite connections are
+    always used by the same thread and the event loop is never blocked.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Create a object. arguments are sent to ReallySimpleDB."""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ReallySimpleDB")
+        self._connection = ""
+        self.db = ReallySimpleDB(*args, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _run(self, function, *args, **kwargs):
+        """
+        Run a function on the executor thread and wait for the result.
+
+        If the coroutine is cancelled, a call that is not started is removed from the
+        executor and a running sqlite query is interrupted. futures returned by the
+        call (group commit) are awaited too.
+        """
+        def call():
+            # connection of the executor thread. in concurrent mode every thread has
+            # its own connection, so it cannot be read on the event loop thread
+            self._connection = self.db.connection
+            return function(*args, **kwargs)
+
+        future = self._executor.submit(call)
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.running() and self._connection != "":
+                self._connection.interrupt()
+            raise
+
+        if isinstance(result, Future):
+            return await asyncio.wrap_future(result)
+        return result
+
+    @asynccontextmanager
+    async def transaction(self, database:str=""):
+        """
+        Group many add_record / delete_record calls into one transaction.
+
+        Same as ReallySimpleDB.transaction(). other coroutines using this object
+        while the block is running are also in the transaction. in concurrent mode
+        the transaction is on the writer thread.
+        """
+        context = self.db.transaction(database=database)
+        run = self.db.run_in_writer
+        await self._run(run, context.__enter__)
+        try:
+            yield self
+        except BaseException as error:
+            # __exit__ rolls back and raises the error again
+            await self._run(run, context.__exit__, type(error), error, error.__traceback__)
+            raise
+        await self._run(run, context.__exit__, None, None, None)
+
+    def batch(self, database:str=""):
+        """Same as transaction()."""
+        return self.transaction(database=database)
+
+    async def iter_records(self,
+            table:str,
+            batch_size:int=1000,
+            order_by:str="",
+            database:str=""):
+        """
+        Get all data / records of a table one by one, using an async generator.
+
+        Records are read on the executor thread in batches of batch_size.
+        """
+        records = await self._run(self.db.iter_records,
+            table=table, batch_size=batch_size, order_by=order_by, database=database)
+
+        while True:
+            batch = await self._run(lambda: list(islice(records, batch_size)))
+            if not batch:
+                return
+
+            for record in batch:
+                yield record
+
+    async def close(self):
+        """Close all the connections and stop the executor thread."""
+        await self._run(self.db.close_all_connections)
+        self._executor.shutdown(wait=True)
+        return True
+
+def _coroutine(name:str):
+    """Create a coroutine method that runs the ReallySimpleDB method on the executor thread."""
+    async def method(self, *args, **kwargs):
+        return await self._run(getattr(self.db, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__qualname__ = "AsyncReallySimpleDB." + name
+    method.__doc__ = getattr(ReallySimpleDB, name).__doc__
+    return method
+
+for _name in (
+        "clean",
+        "set_row_format",
+        "create_connection",
+        "close_all_connections",
+        "create_db",
+        "apply_pragmas",
+        "enable_group_commit",
+        "disable_group_commit",
+        "enable_memory_mode",
+        "disable_memory_mode",
+        "checkpoint",
+        "add_columns",
+        "create_table",
+        "all_tables",
+        "is_table",
+        "delete_table",
+        "get_all_column_types",
+        "get_column_type",
+        "get_columns",
+        "get_primary_key",
+        "add_record",
+        "add_records",
+        "import_file",
+        "update_record",
+        "upsert_records",
+        "export_file",
+        "get_record",
+        "get_records",
+        "get_all_records",
+        "get_records_page",
+        "delete_record",
+        "delete_records",
+        "delete_where",
+        "filter_records",
+        "parallel_scan",
+        "count",
+        "exists",
+        "aggregate",
+        "get_columns_data",
+        "create_index",
+        "drop_index",
+        "list_indexes",
+        "enable_index_advisor",
+        "disable_index_advisor",
+        "suggest_indexes",
+        "enable_record_cache",
+        "disable_record_cache",
+        "record_cache_stats",
+        "enable_instrumentation",
+        "disable_instrumentation",
+        "instrumentation_stats",
+        "slow_queries",
+        "close_connection"):
+    setattr(AsyncReallySimpleDB, _name, _coroutine(_name))
@@ -0,0 +1,174 @@
+import time
+import sqlite3
+import threading
+
+from collections import deque
+
+class Instrumentation:
+    """
+    Instrumentation class.
+
+    Instrumentation objects record the number of calls, latencies and returned rows
+    of ReallySimpleDB methods ("method") and SQL commands ("sql"). calls slower than
+    slow_query_threshold seconds are saved in the slow query log. every record is
+    also sent to the callbacks, so they can be exported to other tools.
+    """
+
+    def __init__(self,
+            slow_query_threshold:float=None,
+            callback=None,
+            sample_size:int=1000,
+            slow_log_size:int=1000) -> None:
+        """
+        Create a object.
+
+        sample_size is the number of latest latencies used for percentiles and
+        slow_log_size is the maximum number of saved slow calls.
+        """
+        self.slow_query_threshold = slow_query_threshold
+        self.sample_size = sample_size
+        self.callbacks = [callback] if callback is not None else []
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """
+        Add a function that is called with every record.
+
+        Records are dictionaries with kind, name, seconds and rows keys. trace records
+        (kind "trace") have only the SQL command as name.
+        """
+        self.callbacks.append(callback)
+        return True
+
+    def record(self, kind:str, name:str, seconds:float, rows:int=None):
+        """Record one call of a method or a SQL command."""
+        with self._lock:
+            stats = self._stats.get((kind, name))
+            if stats is None:
+                stats = {"count": 0, "total": 0.0, "rows": 0,
+                    "latencies": deque(maxlen=self.sample_size)}
+                self._stats[(kind, name)] = stats
+
+            stats["count"] += 1
+            stats["total"] += seconds
+            stats["latencies"].append(seconds)
+            if rows is not None:
+                stats["rows"] += rows
+
+            event = {"kind": kind, "name": name, "seconds": seconds, "rows": rows}
+            if self.slow_query_threshold is not None and seconds >= self.slow_query_threshold:
+                self.slow_queries.append(dict(event, time=time.time()))
+
+        for callback in self.callbacks:
+            callback(event)
+
+    def add_rows(self, kind:str, name:str, rows:int):
+        """Add rows read after the call (SELECT rows fetched from a cursor) to the statistics."""
+        with self._lock:
+            stats = self._stats.get((kind, name))
+            if stats is not None:
+                stats["rows"] += rows
+
+    def iterate(self, name:str, iterator, seconds:float):
+        """
+        Yield the items of an iterator returned by a method and record the method.
+
+        seconds is the time of the method call. the time of every next() is added
+        and the method is recorded when the iterator is finished or closed.
+        """
+        rows = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    seconds += time.perf_counter() - start
+                rows += 1
+                yield item
+        finally:
+            self.record("method", name, seconds, rows)
+
+    def trace(self, sql:str):
+        """Send a SQL command run by sqlite (sqlite3 trace callback) to the callbacks."""
+        event = {"kind": "trace", "name": sql, "seconds": None, "rows": None}
+        for callback in self.callbacks:
+            callback(event)
+
+    @staticmethod
+    def _percentile(latencies:list, percent:int):
+        """Get a percentile of a sorted latencies list (nearest rank)."""
+        index = max(0, -(-len(latencies) * percent // 100) - 1)
+        return latencies[index]
+
+    def stats(self, kind:str=""):
+        """
+        Get the statistics of all the recorded methods and SQL commands.
+
+        Returns a dictionary with (kind, name) keys and count, total, mean, p50, p95,
+        p99 and rows values. times are in seconds.
+        """
+        with self._lock:
+            result = {}
+            for key, stats in self._stats.items():
+                if kind not in ("", key[0]):
+                    continue
+
+                latencies = sorted(stats["latencies"])
+                result[key] = {
+                    "count": stats["count"],
+                    "total": stats["total"],
+                    "mean": stats["total"] / stats["count"],
+                    "p50": self._percentile(latencies, 50),
+                    "p95": self._percentile(latencies, 95),
+                    "p99": self._percentile(latencies, 99),
+                    "rows": stats["rows"]
+                }
+
+            return result
+
+    def reset(self):
+        """Remove all the recorded statistics and slow calls."""
+        with self._lock:
+            self._stats = {}
+            self.slow_queries.clear()
+        return True
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    sqlite3 cursor that counts the fetched rows of its SQL command.
+
+    Used when instrumentation is enabled, because cursor.rowcount of SELECT commands
+    is always -1.
+    """
+
+    instrumentation = None
+    sql = ""
+
+    def _add_rows(self, rows:int):
+        if self.instrumentation is not None and rows:
+            self.instrumentation.add_rows("sql", self.sql, rows)
+
+    def fetchone(self):
+        row = super().fetchone()
+        self._add_rows(row is not None)
+        return row
+
+    def fetchmany(self, size:int=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._add_rows(len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        self._add_rows(1)
+        return row
@@ -1,7 +1,86 @@
 import os
+import csv
+import json
+import time
 import sqlite3
+import threading
+
+from array       import array
+from types       import GeneratorType
+from functools   import wraps, reduce
+from itertools   import islice, chain, groupby
+from contextlib  import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, namedtuple
 
 from .utils     import DATA_TYPES
+from .utils     import filter_shape, filter_sql, order_by_sql
+from .utils     import RecordCache
+from .utils     import ARRAY_TYPES, numpy
+from .utils     import ROW_FORMATS
+from .utils     import profile_pragmas
+from .utils     import file_format, read_file, infer_datatype, coerce_value
+from .utils     import AGGREGATE_FUNCTIONS
+from .utils     import scan_partition
+from .utils     import affinity_value
+from .writer    import Writer
+from .instrumentation import Instrumentation, InstrumentedCursor
+
+# methods that return a future with group commit
+GROUP_COMMIT_METHODS = ("add_record", "update_record", "delete_record")
+
+def write_operation(method):
+    """
+    Run the method on the writer thread in concurrent mode.
+
+    In concurrent mode all the write operations are sent to one writer thread and the
+    calling thread waits for the result. with group commit, GROUP_COMMIT_METHODS
+    return a future instead of waiting. in normal mode the method is called directly.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._writer is None or self._writer.is_writer_thread():
+            return method(self, *args, **kwargs)
+
+        if self._writer.group_commit and method.__name__ in GROUP_COMMIT_METHODS:
+            return self._writer.submit_grouped(method, self, *args, **kwargs)
+
+        return self._writer.submit(method, self, *args, **kwargs).result()
+
+    return wrapper
+
+def instrumented(method):
+    """
+    Record the time and the returned rows of the method when instrumentation is enabled.
+
+    When instrumentation is disabled, the method is called directly.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._instrumentation is None:
+            return method(self, *args, **kwargs)
+
+        start = time.perf_counter()
+        result = method(self, *args, **kwargs)
+        seconds = time.perf_counter() - start
+
+        # returned records, or the number of changed records
+        rows = None
+        if method.__name__ == "get_record":
+            rows = 0 if result in ({}, None) else 1
+        elif isinstance(result, (list, dict)):
+            rows = len(result)
+        elif isinstance(result, int) and not isinstance(result, bool):
+            rows = result
+
+        if isinstance(result, GeneratorType):
+            # records are read while the generator is used
+            return self._instrumentation.iterate(method.__name__, result, seconds)
+
+        self._instrumentation.record("method", method.__name__, seconds, rows)
+        return result
+
+    return wrapper
 
 class ReallySimpleDB:
     """
@@ -12,10 +91,74 @@ class ReallySimpleDB:
     more cases these should be one per database.
     """
 
-    def __init__(self) -> None:
-        """Create a object."""
+    def __init__(self,
+            max_connections:int=8,
+            idle_timeout:float=300,
+            row_format:str="dict",
+            profile:str="",
+            pragmas:dict=None) -> None:
+        """
+        Create a object.
+
+        max_connections is the maximum number of open connections kept in the pool and
+        idle_timeout is the number of seconds an unused connection stays open.
+        row_format is the type of the returned records (see set_row_format). profile
+        and pragmas are the PRAGMA settings of every new connection (see
+        apply_pragmas).
+        """
         self._add_columns_cmd = ""
+        self._schema_cache = {}
+        self._connections = OrderedDict()
+        self._transactions = {}
+        self._filter_cache = OrderedDict()
+        self._index_advisor = None
+        self._instrumentation = None
+        self._instrumentation_hooks = {"trace": False, "progress_handler": None,
+            "progress_steps": 1000}
+        self._record_cache = None
+        self._data_versions = {}
+        self._filter_lock = threading.Lock()
+        self.filter_cache_size = 256
+        self.row_format = "dict"
+        self._row_classes = {}
+        self.pragmas = profile_pragmas(profile, pragmas)
+        self._database = ""
+        self._concurrent = None
+        self._memory = None
+        self._writer = None
+        self._local = threading.local()
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
         self.connection = ""
+        self.set_row_format(row_format)
+
+    @property
+    def connection(self):
+        """
+        Connection with the SQLite database file.
+
+        In concurrent mode every thread has its own connection.
+        """
+        if self._concurrent is None:
+            return self._connection
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._open_thread_connection()
+        return connection
+
+    @connection.setter
+    def connection(self, connection):
+        if self._concurrent is None:
+            self._connection = connection
+        else:
+            self._local.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_all_connections()
 
     def clean(self):
         """
@@ -28,30 +171,849 @@ class ReallySimpleDB:
         """
         self._add_columns_cmd = ""
 
-    def create_connection(self, database):
-        """Open a connection to the SQLite database file."""
-        self.connection = sqlite3.connect(database)
+    def _get_schema(self):
+        """
+        Get the schema cache of the current connection.
+
+        Table names, column types and primary keys are saved here on first use, so
+        record operations do not have to query sqlite_master and PRAGMA TABLE_INFO
+        again and again. if 'PRAGMA schema_version' is changed (table created or
+        altered by another connection), the cache is dropped and filled again.
+        """
+        version = self._execute("PRAGMA schema_version;").fetchone()[0]
+        schema = self._schema_cache.get(self.connection)
+
+        if schema is None or schema["version"] != version:
+            schema = {"version": version, "tables": None, "columns": {}, "primary_keys": {},
+                "keysets": {}, "validators": {}}
+            self._schema_cache[self.connection] = schema
+
+        return schema
+
+    def _clear_schema(self):
+        """Drop the schema cache of the current connection."""
+        self._schema_cache.pop(self.connection, None)
+
+    def _get_tables(self, schema=None):
+        """Get the table names list of the current connection from the schema cache."""
+        if schema is None:
+            schema = self._get_schema()
+
+        if schema["tables"] is None:
+            sql_cmd = "SELECT name FROM sqlite_master WHERE type='table';"
+            schema["tables"] = [tables[0] for tables in self._execute(sql_cmd)]
+
+        return schema["tables"]
+
+    def _get_table_info(self, table:str, schema=None):
+        """
+        Get the column types dictionary and the primary key of a table.
+
+        Both are taken from the schema cache. if table is not in the cache, one
+        PRAGMA TABLE_INFO query fills the column names, types and primary key.
+        methods that use the schema cache many times get the schema once and send
+        it here, so 'PRAGMA schema_version' is checked once per call.
+        """
+        if schema is None:
+            schema = self._get_schema()
+
+        if table not in schema["columns"]:
+            if table not in self._get_tables(schema):
+                # raise OperationalError if the given table not exists
+                raise sqlite3.OperationalError("no such table: {}".format(table))
+
+            column_types = {}
+            primary_keys = []
+            not_null = set()
+            sql_cmd = "PRAGMA TABLE_INFO(" + table + ");"
+            for data in self._execute(sql_cmd):
+                column_types[data[1]] = data[2]
+                # data[5] is the position of the column in the primary key
+                if data[5]:
+                    primary_keys.append(data[1])
+                if data[3]:
+                    not_null.add(data[1])
+
+            schema["columns"][table] = column_types
+            schema["primary_keys"][table] = primary_keys[0] if primary_keys else None
+            # unique column used for keyset pagination. sqlite allows NULL in
+            # primary keys that are not INTEGER PRIMARY KEY (rowid) or NOT NULL, and
+            # NULL cannot be the 'after' value of a page. these tables and tables
+            # without a single column primary key are paginated using the rowid
+            if len(primary_keys) == 1 and (column_types[primary_keys[0]].upper() == "INTEGER"
+                    or primary_keys[0] in not_null):
+                schema["keysets"][table] = primary_keys[0]
+            else:
+                schema["keysets"][table] = "rowid"
+
+        return schema["columns"][table], schema["primary_keys"][table]
+
+    @staticmethod
+    def _resolve_path(database:str):
+        """Get the key of a database in the connection pool."""
+        if database == ":memory:" or database.startswith("file:"):
+            return database
+        return os.path.realpath(database)
+
+    def _close_pooled(self, path:str):
+        """
+        Close and remove a connection from the pool.
+
+        The in-memory database of memory mode is saved to its file before closing.
+        """
+        connection = self._connections.pop(path)[0]
+        if self._memory is not None and connection is self._memory["connection"]:
+            self._stop_memory_mode(save=True)
+        self._schema_cache.pop(connection, None)
+        self._forget_records(connection)
+        connection.close()
+
+        if connection is self.connection:
+            self._database = ""
+
+    def _release_connections(self):
+        """
+        Close idle connections and keep the pool size under max_connections.
+
+        The current connection and connections with an open transaction are never
+        closed here.
+        """
+        now = time.monotonic()
+        for path in list(self._connections):
+            connection, last_used = self._connections[path]
+            if connection is self.connection or connection.in_transaction:
+                continue
+            # the in-memory database is kept until memory mode is disabled
+            if self._memory is not None and connection is self._memory["connection"]:
+                continue
+            if now - last_used > self.idle_timeout or len(self._connections) > self.max_connections:
+                self._close_pooled(path)
+
+    def _get_validators(self, table:str, schema=None):
+        """
+        Get the python types of all the columns in a table.
+
+        DATA_TYPES are resolved once per table and saved in the schema cache. None is
+        used for columns with not supported data types.
+        """
+        if schema is None:
+            schema = self._get_schema()
+        column_types = self._get_table_info(table, schema)[0]
+
+        if table not in schema["validators"]:
+            schema["validators"][table] = {
+                column: DATA_TYPES.get(column_types[column].upper()) for column in column_types}
+
+        return schema["validators"][table]
+
+    @staticmethod
+    def _record_values(record, validators:dict):
+        """
+        Get the values list of a record in the column order of the table.
+
+        record can be a dict or a tuple / list with a value for every column. values
+        are checked with the data types of the columns.
+        """
+        if isinstance(record, dict):
+            values = dict.fromkeys(validators, "")
+            fields = record.items()
+        elif isinstance(record, (tuple, list)):
+            if len(record) != len(validators):
+                raise TypeError("'record' requires {} values but got {}"
+                    .format(len(validators), len(record)))
+            values = {}
+            fields = zip(validators, record)
+        else:
+            raise TypeError("'record' must be dict or tuple")
+
+        for field, value in fields:
+            ReallySimpleDB._check_value(field, value, validators)
+            values[field] = value
+
+        return list(values.values())
+
+    @staticmethod
+    def _check_value(field:str, value, validators:dict):
+        """Check if the value of a field matches the data type of the column."""
+        # if the user has defined a column that is not in the table..
+        if field not in validators:
+            raise NameError("'{}' column is not in the table".format(field))
+
+        if validators[field] is None:
+            raise TypeError("datatype not supported, '{}'".format(field))
+
+        # if the user has defines values that is not match with the
+        # datatypes of the columns..
+        if validators[field] != type(value):
+            raise TypeError("The '{}' field requires '{}' but got '{}'"
+            .format(field, validators[field], type(value)))
+
+    def set_row_format(self, row_format:str):
+        """
+        Set the type of the records returned by the get / filter methods.
+
+        dict (default) returns dictionaries with column names. tuple returns the rows
+        as they are, namedtuple uses a namedtuple class of the table and row uses
+        sqlite3.Row. tuple, namedtuple and row are created by sqlite3 in C, and do
+        not repeat the column names in every record.
+        """
+        if row_format not in ROW_FORMATS:
+            raise ValueError("row format not supported, '{}'".format(row_format))
+
+        self.row_format = row_format
+        self._row_classes = {}
+        # cached records are in the old row format
+        if self._record_cache is not None:
+            self.enable_record_cache(size=self._record_cache.size, ttl=self._record_cache.ttl)
+        return True
+
+    def _select(self, sql:str, params=(), connection=None):
+        """Execute a SELECT command with a cursor for the row format of the object."""
+        connection = connection or self.connection
+        if self._instrumentation is None:
+            cursor = connection.cursor()
+        else:
+            cursor = connection.cursor(InstrumentedCursor)
+        if self.row_format == "row":
+            cursor.row_factory = sqlite3.Row
+        return self._execute(sql, params, cursor=cursor)
+
+    def _make_records(self, rows, columns:list, table:str):
+        """Create records in the row format of the object from the rows."""
+        if self.row_format == "dict":
+            return [dict(zip(columns, row)) for row in rows]
+
+        if self.row_format == "namedtuple":
+            key = (table, tuple(columns))
+            if key not in self._row_classes:
+                self._row_classes[key] = namedtuple(
+                    table if table.isidentifier() else "Record", columns, rename=True)
+            return list(map(self._row_classes[key]._make, rows))
+
+        # tuple and sqlite3.Row rows are created by the cursor
+        return list(rows)
+
+    def _projection(self, table:str, columns=None, schema=None):
+        """
+        Get the selected columns list and the SELECT list of a table.
+
+        columns can be None (all the columns), a column name or a list of column
+        names. column names are checked with the schema cache.
+        """
+        table_columns = list(self._get_table_info(table, schema)[0])
+        if columns is None:
+            return table_columns, "*"
+
+        if isinstance(columns, str):
+            columns = [columns]
+
+        if not columns:
+            raise ValueError("'columns' must not be empty")
+
+        for column in columns:
+            if column not in table_columns:
+                raise sqlite3.OperationalError("no such column: {}".format(column))
+
+        return list(columns), ", ".join(columns)
+
+    def _execute(self, sql:str, params=(), connection=None, cursor=None, many:bool=False):
+        """
+        Execute a SQL command on a connection or a cursor.
+
+        When instrumentation is enabled, the time and the number of changed rows are
+        recorded. time of SELECT commands is the time until the first row, and their
+        rows are counted when they are fetched (InstrumentedCursor).
+        """
+        target = cursor or connection or self.connection
+
+        if self._instrumentation is None:
+            execute = target.executemany if many else target.execute
+            return execute(sql, params)
+
+        if cursor is None:
+            target = target.cursor(InstrumentedCursor)
+        if isinstance(target, InstrumentedCursor):
+            target.instrumentation = self._instrumentation
+            target.sql = sql
+        execute = target.executemany if many else target.execute
+
+        start = time.perf_counter()
+        result = execute(sql, params)
+        seconds = time.perf_counter() - start
+
+        self._instrumentation.record("sql", sql, seconds,
+            result.rowcount if result.rowcount >= 0 else None)
+        return result
+
+    def _commit_connection(self, connection):
+        """Commit a connection. when instrumentation is enabled, the time is recorded."""
+        if self._instrumentation is None:
+            connection.commit()
+            return
+
+        start = time.perf_counter()
+        connection.commit()
+        self._instrumentation.record("sql", "COMMIT", time.perf_counter() - start)
+
+    def _setup_connection(self, connection):
+        """Set the pragmas and the instrumentation hooks of a new connection."""
+        self._apply_pragmas(connection, self.pragmas)
+
+        if self._instrumentation is not None:
+            self._set_hooks(connection)
+
+    def _set_hooks(self, connection, remove:bool=False):
+        """Set (or remove) the sqlite3 trace callback and progress handler of a connection."""
+        hooks = self._instrumentation_hooks
+        if hooks["trace"] or remove:
+            connection.set_trace_callback(None if remove else self._instrumentation.trace)
+        if hooks["progress_handler"] is not None or remove:
+            connection.set_progress_handler(None if remove else hooks["progress_handler"],
+                hooks["progress_steps"])
+
+    def _open_connections(self):
+        """Get all the open connections of the object."""
+        if self._concurrent is not None:
+            with self._concurrent["lock"]:
+                return list(self._concurrent["connections"].values())
+        return [pooled[0] for pooled in self._connections.values()]
+
+    def enable_instrumentation(self,
+            slow_query_threshold:float=None,
+            callback=None,
+            trace:bool=False,
+            progress_handler=None,
+            progress_steps:int=1000):
+        """
+        Start recording the calls of the methods and the SQL commands.
+
+        Count, total and percentile latencies and returned rows are recorded for every
+        method and SQL command. calls slower than slow_query_threshold seconds are
+        saved in the slow query log. callback is called with every record. if trace
+        is True, every SQL command run by sqlite is sent to the callbacks (sqlite3
+        set_trace_callback) and progress_handler is called every progress_steps
+        sqlite virtual machine instructions (sqlite3 set_progress_handler). returns
+        the Instrumentation object.
+        """
+        self.disable_instrumentation()
+
+        self._instrumentation = Instrumentation(
+            slow_query_threshold=slow_query_threshold, callback=callback)
+        self._instrumentation_hooks = {"trace": trace, "progress_handler": progress_handler,
+            "progress_steps": progress_steps}
+
+        for connection in self._open_connections():
+            self._set_hooks(connection)
+
+        return self._instrumentation
+
+    def disable_instrumentation(self):
+        """Stop recording the calls. costs nothing when disabled."""
+        if self._instrumentation is None:
+            return False
+
+        for connection in self._open_connections():
+            self._set_hooks(connection, remove=True)
+
+        self._instrumentation = None
+        return True
+
+    def instrumentation_stats(self, kind:str=""):
+        """
+        Get the recorded statistics of the methods ("method") and SQL commands ("sql").
+
+        See Instrumentation.stats.
+        """
+        if self._instrumentation is None:
+            raise NotImplementedError(
+                "call 'enable_instrumentation' function before instrumentation_stats")
+
+        return self._instrumentation.stats(kind=kind)
+
+    def slow_queries(self):
+        """Get the slow query log. every item has kind, name, seconds, rows and time keys."""
+        if self._instrumentation is None:
+            raise NotImplementedError(
+                "call 'enable_instrumentation' function before slow_queries")
+
+        return list(self._instrumentation.slow_queries)
+
+    @staticmethod
+    def _apply_pragmas(connection, pragmas:dict):
+        """Set the pragmas of a connection. returns the old values of the pragmas."""
+        old_pragmas = {}
+        for name in pragmas:
+            # fetchall resets the statement. an unfinished statement keeps
+            # a read lock and journal_mode cannot be changed
+            old_value = connection.execute("PRAGMA " + name + ";").fetchall()
+            # some pragmas do not return their values
+            if old_value:
+                old_pragmas[name] = old_value[0][0]
+            connection.execute("PRAGMA " + name + "=" + str(pragmas[name]) + ";").fetchall()
+
+        return old_pragmas
+
+    def apply_pragmas(self, profile:str="", pragmas:dict=None, database:str=""):
+        """
+        Set the PRAGMA settings of the connection using a profile and / or a dictionary.
+
+        Profiles are durable, fast, bulk_load and read_only_analytics (see
+        PRAGMA_PROFILES). pragmas like {"synchronous": "OFF", "cache_size": -65536}
+        replace the settings of the profile. returns the old values, which can be
+        given back as pragmas to restore the settings.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("apply_pragmas() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        return self._apply_pragmas(self.connection, profile_pragmas(profile, pragmas))
+
+    @contextmanager
+    def pragma_profile(self, profile:str="", pragmas:dict=None, database:str=""):
+        """
+        Use a PRAGMA profile inside the with block and restore the old settings at exit.
+
+        For example, bulk_load profile for an ingest window.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("pragma_profile() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        connection = self.connection
+        old_pragmas = self._apply_pragmas(connection, profile_pragmas(profile, pragmas))
+        try:
+            yield self
+        finally:
+            self._apply_pragmas(connection, old_pragmas)
+
+    def create_connection(self, database, profile:str="", pragmas:dict=None):
+        """
+        Open a connection to the SQLite database file.
+
+        Connections are kept in a pool with one open connection per database path. so
+        calling methods with the 'database' parameter again and again reuses the same
+        connection instead of opening a new one every time. profile and pragmas are set
+        on the connection (see apply_pragmas). new connections use the pragmas of the
+        object.
+        """
+        if profile or pragmas:
+            # check the profile before opening the connection
+            settings = profile_pragmas(profile, pragmas)
+
+        if self._concurrent is not None:
+            # in concurrent mode the thread connections are used
+            if self._resolve_path(database) != self._concurrent["path"]:
+                raise ValueError(
+                    "concurrent mode is enabled for '{}'".format(self._concurrent["path"]))
+            if profile or pragmas:
+                self._apply_pragmas(self.connection, settings)
+            return True
+
+        # same database as the last call. nothing to do
+        if database == self._database:
+            if profile or pragmas:
+                self._apply_pragmas(self.connection, settings)
+            return True
+
+        now = time.monotonic()
+        for pooled in self._connections.values():
+            # last used time of the connection that is being replaced
+            if pooled[0] is self.connection:
+                pooled[1] = now
+
+        path = self._resolve_path(database)
+        if path in self._connections:
+            # moves the connection to the end, so the least recently used
+            # connection is always at the beginning of the pool
+            self._connections.move_to_end(path)
+        else:
+            connection = sqlite3.connect(database)
+            self._setup_connection(connection)
+            self._connections[path] = [connection, 0]
+
+        self._connections[path][1] = now
+        self.connection = self._connections[path][0]
+        self._database = database
+
+        if profile or pragmas:
+            self._apply_pragmas(self.connection, settings)
+
+        self._release_connections()
         return True
 
-    def create_db(self, dbpath:str="", replace:bool=False):
-        """Create a new database in a given path."""
+    def close_all_connections(self):
+        """Close all the connections in the pool."""
+        if self._concurrent is not None:
+            self.disable_concurrent_mode()
+
+        for path in list(self._connections):
+            self._close_pooled(path)
+
+        self.connection = ""
+        return True
+
+    def enable_concurrent_mode(self, database:str="", busy_timeout:float=5.0):
+        """
+        Share the object between threads.
+
+        Turns on WAL journal mode, so readers do not block the writer. every thread
+        gets its own read connection and all the write operations (add_record,
+        delete_record, create_table, ..) are sent to one writer thread. busy_timeout
+        is the number of seconds to wait for locks of other processes.
+        """
+        if self.connection == "" and not database:
+            raise TypeError(
+                "enable_concurrent_mode() missing 1 required positional argument: 'database'")
+
+        if self._concurrent is not None:
+            raise sqlite3.ProgrammingError("concurrent mode is already enabled")
+
+        if self._memory is not None:
+            raise sqlite3.ProgrammingError("concurrent mode cannot be used with memory mode")
+
+        if database:
+            self.create_connection(database)
+
+        # path of the main database of the connection. empty for in-memory databases
+        path = self.connection.execute("PRAGMA database_list;").fetchone()[2]
+        if not path:
+            raise ValueError("concurrent mode needs a database file")
+
+        self.connection.execute("PRAGMA journal_mode=WAL;")
+        self.close_all_connections()
+
+        self._local = threading.local()
+        self._writer = Writer()
+        # connections of the threads. connections of finished threads are closed
+        # when a new thread connection is opened
+        self._concurrent = {"path": path, "busy_timeout": busy_timeout, "connections": {},
+            "lock": threading.Lock()}
+        self._database = path
+        return True
+
+    def disable_concurrent_mode(self):
+        """Stop the writer thread, close the thread connections and go back to normal mode."""
+        if self._concurrent is None:
+            return False
+
+        self._writer.stop()
+        self._writer = None
+
+        concurrent, self._concurrent = self._concurrent, None
+        for connection in concurrent["connections"].values():
+            self._close_thread_connection(connection)
+
+        self._database = ""
+        self.create_connection(concurrent["path"])
+        return True
+
+    def enable_group_commit(self, database:str="", max_rows:int=500, max_delay:float=0.005):
+        """
+        Commit many add_record / update_record / delete_record calls together.
+
+        These methods return a concurrent.futures.Future instead of the result.
+        the writer thread collects the calls of all threads into one transaction,
+        which is committed after max_rows calls or max_delay seconds, and then the
+        futures get their results. every call has its own savepoint, so a failed
+        call does not roll back the others. concurrent mode is enabled if it is not
+        enabled.
+        """
+        if max_rows < 1:
+            raise ValueError("max_rows must be greater than 0")
+
+        if max_delay < 0:
+            raise ValueError("max_delay must not be negative")
+
+        if self._concurrent is None:
+            self.enable_concurrent_mode(database=database)
+
+        self._writer.enable_group_commit(self.transaction, max_rows=max_rows,
+            max_delay=max_delay)
+        return True
+
+    def disable_group_commit(self):
+        """Wait for the queued calls and go back to one commit per call."""
+        if self._writer is None or not self._writer.group_commit:
+            return False
+
+        self._writer.disable_group_commit()
+        # the queued calls run before this one
+        self._writer.submit(bool).result()
+        return True
+
+    def _open_thread_connection(self):
+        """Open the connection of the current thread in concurrent mode."""
+        connection = sqlite3.connect(self._concurrent["path"],
+            timeout=self._concurrent["busy_timeout"], check_same_thread=False)
+        self._setup_connection(connection)
+
+        # only the writer thread can write to the database
+        if not self._writer.is_writer_thread():
+            connection.execute("PRAGMA query_only=1;")
+
+        with self._concurrent["lock"]:
+            connections = self._concurrent["connections"]
+            finished = [thread for thread in connections if not thread.is_alive()]
+            closed = [connections.pop(thread) for thread in finished]
+            connections[threading.current_thread()] = connection
+
+        for finished_connection in closed:
+            self._close_thread_connection(finished_connection)
+
+        self._local.connection = connection
+        return connection
+
+    def _close_thread_connection(self, connection):
+        """Close a thread connection of concurrent mode and drop its caches."""
+        self._schema_cache.pop(connection, None)
+        self._forget_records(connection)
+        self._transactions.pop(connection, None)
+        connection.close()
+
+    def run_in_writer(self, function, *args, **kwargs):
+        """
+        Run a function on the writer thread and get the result.
+
+        In concurrent mode transaction() blocks must run on the writer thread, like
+        db.run_in_writer(function, db) where function uses 'with db.transaction()'.
+        in normal mode the function is called directly.
+        """
+        if self._writer is None or self._writer.is_writer_thread():
+            return function(*args, **kwargs)
+        return self._writer.submit(function, *args, **kwargs).result()
+
+    def enable_memory_mode(self,
+            database:str,
+            checkpoint_interval:float=None,
+            pages:int=1024):
+        """
+        Load a database file into memory and use the in-memory database.
+
+        The file is copied with the sqlite backup API and all the methods use the
+        in-memory copy, also with database=<the file>. changes are saved back to the
+        file by checkpoint(), every checkpoint_interval seconds (timer thread), and
+        when the connection is closed. checkpoints copy pages pages per step, so the
+        in-memory database is not locked for the whole copy.
+        """
+        if self._concurrent is not None:
+            raise sqlite3.ProgrammingError("memory mode cannot be used with concurrent mode")
+
+        if self._memory is not None:
+            raise sqlite3.ProgrammingError("memory mode is already enabled")
+
+        if checkpoint_interval is not None and checkpoint_interval <= 0:
+            raise ValueError("checkpoint_interval must be greater than 0")
+
+        path = self._resolve_path(database)
+        if path in self._connections:
+            # the pooled file connection may have changes that are not committed
+            self._close_pooled(path)
+
+        # checkpoints of the timer thread use both connections
+        disk = sqlite3.connect(database, check_same_thread=False)
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        disk.backup(connection)
+        self._setup_connection(connection)
+
+        self._memory = {"path": path, "disk": disk, "connection": connection, "pages": pages,
+            "interval": checkpoint_interval, "timer": None, "lock": threading.Lock(),
+            "closed": False}
+        self._connections[path] = [connection, time.monotonic()]
+        self.connection = connection
+        self._database = database
+
+        if checkpoint_interval is not None:
+            self._schedule_checkpoint()
+        return True
+
+    def disable_memory_mode(self, save:bool=True):
+        """
+        Stop using the in-memory database and go back to the database file.
+
+        If save is True, the in-memory database is saved to the file first. else,
+        the changes after the last checkpoint are lost.
+        """
+        if self._memory is None:
+            return False
+
+        memory = self._memory
+        self._stop_memory_mode(save=save)
+
+        del self._connections[memory["path"]]
+        self._schema_cache.pop(memory["connection"], None)
+        self._forget_records(memory["connection"])
+        memory["connection"].close()
+
+        if memory["connection"] is self.connection:
+            self._database = ""
+            self.create_connection(memory["path"])
+        return True
+
+    @instrumented
+    def checkpoint(self, pages:int=None):
+        """
+        Save the in-memory database of memory mode to its file.
+
+        pages is the number of pages copied per step (default: the pages of
+        enable_memory_mode). changes inside a transaction() block are not saved, so
+        checkpoint cannot be used inside a block.
+        """
+        if self._memory is None:
+            raise NotImplementedError("call 'enable_memory_mode' function before checkpoint")
+
+        if self._memory["connection"].in_transaction:
+            raise sqlite3.ProgrammingError("cannot checkpoint inside a transaction")
+
+        self._save_memory(self._memory, pages)
+        return True
+
+    def _save_memory(self, memory:dict, pages:int=None):
+        """Copy the in-memory database of memory mode to the file, pages pages per step."""
+        start = time.perf_counter()
+
+        with memory["lock"]:
+            # the timer thread can start a checkpoint while memory mode is stopped
+            if memory["closed"]:
+                return
+            memory["connection"].backup(memory["disk"], pages=pages or memory["pages"])
+
+        if self._instrumentation is not None:
+            self._instrumentation.record("sql", "BACKUP", time.perf_counter() - start)
+
+    def _schedule_checkpoint(self):
+        """Start the timer thread of the next interval checkpoint."""
+        timer = threading.Timer(self._memory["interval"], self._interval_checkpoint,
+            args=(self._memory,))
+        timer.daemon = True
+        self._memory["timer"] = timer
+        timer.start()
+
+    def _interval_checkpoint(self, memory:dict):
+        """Save the in-memory database on the timer thread and start the next timer."""
+        if memory is not self._memory:
+            return
+
+        try:
+            # open transactions are saved by the next checkpoint
+            if not memory["connection"].in_transaction:
+                self._save_memory(memory)
+        finally:
+            if memory is self._memory:
+                self._schedule_checkpoint()
+
+    def _stop_memory_mode(self, save:bool):
+        """Stop the checkpoint timer, save the in-memory database and close the file connection."""
+        memory, self._memory = self._memory, None
+        if memory["timer"] is not None:
+            memory["timer"].cancel()
+
+        try:
+            if save:
+                self._save_memory(memory)
+        finally:
+            with memory["lock"]:
+                memory["closed"] = True
+                memory["disk"].close()
+
+    def _commit(self):
+        """Commit the current connection, if it is not in a transaction() block."""
+        if not self._transactions.get(self.connection):
+            self._commit_connection(self.connection)
+
+    @contextmanager
+    def transaction(self, database:str=""):
+        """
+        Group many add_record / delete_record calls into one transaction.
+
+        Inside the with block the mutation methods do not commit. the block commits
+        once at exit, or rolls back everything if an exception is raised. nested
+        blocks use savepoints, so an inner block can be rolled back alone.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("transaction() missing 1 required positional argument: 'database'")
+
+        if self._writer is not None and not self._writer.is_writer_thread():
+            raise NotImplementedError(
+                "use 'run_in_writer' for transactions in concurrent mode")
+
+        if database:
+            self.create_connection(database)
+
+        connection = self.connection
+        depth = self._transactions.get(connection, 0)
+
+        if depth:
+            savepoint = "rsdb_savepoint_" + str(depth)
+            connection.execute("SAVEPOINT " + savepoint + ";")
+        elif not connection.in_transaction:
+            connection.execute("BEGIN;")
+
+        self._transactions[connection] = depth + 1
+        try:
+            yield self
+        except BaseException:
+            if depth:
+                connection.execute("ROLLBACK TO " + savepoint + ";")
+                connection.execute("RELEASE " + savepoint + ";")
+            else:
+                connection.rollback()
+            # cached records may be read inside the rolled back transaction
+            self._forget_records(connection)
+            raise
+        else:
+            if depth:
+                connection.execute("RELEASE " + savepoint + ";")
+            else:
+                self._commit_connection(connection)
+        finally:
+            if depth:
+                self._transactions[connection] = depth
+            else:
+                del self._transactions[connection]
+
+    def batch(self, database:str=""):
+        """
+        Defer the commits of mutation methods until the end of the with block.
+
+        Same as transaction(). commits once at exit and rolls back on errors.
+        """
+        return self.transaction(database=database)
+
+    @instrumented
+    def create_db(self, dbpath:str="", replace:bool=False, profile:str="", pragmas:dict=None):
+        """
+        Create a new database in a given path.
+
+        profile and pragmas are set on the connection of the new database (see
+        apply_pragmas). page_size can be set only here, before creating tables.
+        """
         if self.connection == "" and not dbpath:
             raise TypeError("create_db() missing 1 required positional argument: 'dbpath'")
 
         if replace:
             # delete if database exists in given path
             if os.path.isfile(os.path.realpath(dbpath)):
+                # close the pooled connection of the old database before deleting it
+                if os.path.realpath(dbpath) in self._connections:
+                    self._close_pooled(os.path.realpath(dbpath))
                 os.remove(os.path.realpath(dbpath))
 
         if not os.path.isfile(os.path.realpath(dbpath)):
             # create new connection with creating new database
-            self.connection = sqlite3.connect(os.path.realpath(dbpath))
+            self._database = ""
+            self.create_connection(os.path.realpath(dbpath), profile=profile, pragmas=pragmas)
             return True
 
         raise FileExistsError(
             "'{}' file exists. for replace add parameter 'replace=True'".format(dbpath)
             )
 
+    @instrumented
+    @write_operation
     def add_columns(self,
             column_name:str,
             datatype:str="TEXT",
@@ -78,13 +1040,14 @@ class ReallySimpleDB:
             # if the table is defined, it means that the user is trying to add a
             # column to an existing table.
             self.create_connection(database=database)
-            cursor = self.connection.cursor()
             sql_cmd = "ALTER TABLE " + table + " ADD COLUMN " + column_name + " " + datatype
             if not_null:
                 sql_cmd += " NOT NULL"
             if primary_key:
                 sql_cmd += " PRIMARY KEY"
-            cursor.execute(sql_cmd)
+            self._execute(sql_cmd)
+            self._clear_schema()
+            self._invalidate_records(table)
             return True
 
         # if table is not defines, it means that the user is trying to add / define
@@ -100,6 +1063,8 @@ class ReallySimpleDB:
 
         return True
 
+    @instrumented
+    @write_operation
     def create_table(self, table_name:str, database:str=""):
         """Create new table in database."""
         if self.connection == "" and not database:
@@ -116,9 +1081,11 @@ class ReallySimpleDB:
 
         sql_cmd = "CREATE TABLE " + table_name + " (" + self._add_columns_cmd[1:] + ")"
 
-        self.connection.execute(sql_cmd)
+        self._execute(sql_cmd)
+        self._clear_schema()
         return True
 
+    @instrumented
     def all_tables(self, database:str=""):
         """Get a list of all the tables in the database."""
         if self.connection == "" and not database:
@@ -127,10 +1094,9 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        cursor = self.connection.cursor()
-        sql_cmd = "SELECT name FROM sqlite_master WHERE type='table';"
-        return [tables[0] for tables in cursor.execute(sql_cmd)]
+        return list(self._get_tables())
 
+    @instrumented
     def is_table(self, table_name:str, database:str=""):
         """Check if the given table is exists in the database."""
         if self.connection == "" and not database:
@@ -139,10 +1105,14 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        if table_name in self.all_tables(database):
-            return True
-        return False
+        try:
+            self._get_table_info(table_name)
+        except sqlite3.OperationalError:
+            return False
+        return True
 
+    @instrumented
+    @write_operation
     def delete_table(self, table:str, database:str=""):
         """Delete a table from the database."""
         if self.connection == "" and not database:
@@ -152,15 +1122,17 @@ class ReallySimpleDB:
             self.create_connection(database)
 
         if self.is_table(table_name=table):
-            cursor = self.connection.cursor()
             sql_cmd = "DROP TABLE " + table + ";"
-            cursor.execute(sql_cmd)
+            self._execute(sql_cmd)
+            self._clear_schema()
+            self._invalidate_records(table)
 
             return True
 
         # raise OperationalError if the given table not exists
         raise sqlite3.OperationalError("no such table: {}".format(table))
 
+    @instrumented
     def get_all_column_types(self, table:str, database:str=""):
         """Get all the column names with the data types in a table."""
         if self.connection == "" and not database:
@@ -170,21 +1142,10 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        if self.is_table(table_name=table, database=database):
-            cursor = self.connection.cursor()
-
-            sql_cmd = "PRAGMA TABLE_INFO(" + table + ");"
-            fetch = cursor.execute(sql_cmd)
-
-            data_dict = {}
-            for data in fetch.fetchall():
-                data_dict[data[1]] = data[2]
-
-            return data_dict
-
-        # raise OperationalError if the given table not exists
-        raise sqlite3.OperationalError("no such table: {}".format(table))
+        # returns a copy. so the user cannot change the schema cache
+        return dict(self._get_table_info(table)[0])
 
+    @instrumented
     def get_column_type(self, table:str, column:str, database:str=""):
         """Get data type of a column in a table."""
         all_data = self.get_all_column_types(table=table, database=database)
@@ -195,6 +1156,7 @@ class ReallySimpleDB:
 
         raise sqlite3.OperationalError("no such column: {}".format(column))
 
+    @instrumented
     def get_columns(self, table:str, database:str=""):
         """Get all the column names list in a table."""
         if self.connection == "" and not database:
@@ -203,15 +1165,9 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        # get all columns with data types using get_all_column_types
-        column_types = self.get_all_column_types(table=table, database=database)
-        columns = []
-        if isinstance(column_types, dict):
-            for column in column_types:
-                columns.append(column)
-
-        return columns
+        return list(self._get_table_info(table)[0])
 
+    @instrumented
     def get_primary_key(self, table:str, database:str=""):
         """Find and get primary key of a table."""
         if self.connection == "" and not database:
@@ -220,16 +1176,14 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        if self.is_table(table_name=table, database=database):
-            cursor = self.connection.cursor()
+        primary_key = self._get_table_info(table)[1]
+        if primary_key is None:
+            raise sqlite3.OperationalError("no primary key in table: {}".format(table))
 
-            sql_cmd = "SELECT * FROM pragma_table_info(?) WHERE pk;"
-            fetch = cursor.execute(sql_cmd, (table,))
-            return fetch.fetchall()[0][1]
-
-        # raise OperationalError if the given table not exists
-        raise sqlite3.OperationalError("no such table: {}".format(table))
+        return primary_key
 
+    @instrumented
+    @write_operation
     def add_record(self, table:str, record, database:str=""):
         """Add a new record to a table."""
         if self.connection == "" and not database:
@@ -238,117 +1192,501 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        if self.is_table(table_name=table, database=database):
-            cursor = self.connection.cursor()
+        if not isinstance(record, dict):
+            raise TypeError("'record' must be dict")
 
-            # get all columns with data types using get_all_column_types
-            tmp_all_columns = self.get_all_column_types(table=table, database=database)
-            all_columns = {}
+        # get the column types from the schema cache. raises OperationalError
+        # if the given table not exists
+        schema = self._get_schema()
+        validators = self._get_validators(table, schema)
+        fields = self._record_values(record, validators)
 
-            # appends column names of the given table to all_columns dictionary
-            for column in tmp_all_columns:
-                all_columns[column] = ""
+        sql_cmd = "INSERT INTO " + table + " VALUES(" + ",".join("?" * len(fields)) + ");"
 
-            fields = []
-            sql_cmd = "INSERT INTO " + table + " VALUES("
+        self._execute(sql_cmd, fields)
+        self._commit()
 
-            # if record is dict type,..
-            if isinstance(record, dict):
-                for field in record:
-                    # if the user has defined a column that is not in the table..
-                    if field not in all_columns:
-                        raise NameError("'{}' column is not in the table".format(field))
+        primary_key = self._get_table_info(table, schema)[1]
+        if primary_key is not None:
+            self._invalidate_records(table, fields[list(validators).index(primary_key)],
+                schema)
 
-                    # if the user has defines values that is match with the
-                    # datatypes of the columns..
-                    if DATA_TYPES[tmp_all_columns[field]] == type(record[field]):
-                        all_columns[field] = record[field]
-                    else:
-                        raise TypeError("The '{}' field requires '{}' but got '{}'"
-                        .format(field, DATA_TYPES[tmp_all_columns[field]], type(record[field])))
+        return True
 
-                # creates the full SQL command
-                for field in all_columns:
-                    fields.append(all_columns[field])
-                    sql_cmd+= "?,"
+    @instrumented
+    @write_operation
+    def add_records(self, table:str, records, chunk_size:int=1000, database:str=""):
+        """
+        Add many records to a table.
 
-                # removes unnecessary characters and complete the SQL command
-                sql_cmd = sql_cmd[:-1] + ");"
+        records can be any iterable (list, generator, ..) of dicts or tuples. records
+        are inserted with executemany in chunks of chunk_size and every chunk is
+        committed once, instead of one commit per record. returns the number of
+        inserted records.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("add_records() missing 1 required positional argument: 'database'")
 
-                cursor.execute(sql_cmd, fields)
-                self.connection.commit()
-            else:
-                raise TypeError("'record' must be dict")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than 0")
 
-            return True
+        if database:
+            self.create_connection(database)
 
-        # raise OperationalError if the given table not exists
-        raise sqlite3.OperationalError("no such table: {}".format(table))
+        validators = self._get_validators(table)
+        sql_cmd = "INSERT INTO " + table + " VALUES(" + ",".join("?" * len(validators)) + ");"
+
+        # chunks are committed one by one. if a chunk fails, the cached records
+        # are removed for the committed chunks
+        try:
+            return self._execute_chunks(sql_cmd,
+                (self._record_values(record, validators) for record in records), chunk_size)
+        finally:
+            self._invalidate_records(table)
+
+    def _execute_chunks(self, sql:str, rows, chunk_size:int):
+        """
+        Execute a SQL command with executemany for chunks of parameter rows.
+
+        rows can be any iterable. returns the number of rows.
+        """
+        rows = iter(rows)
+        count = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return count
+
+            # every chunk is one transaction. if the chunk is not completed, earlier
+            # chunks are kept and this chunk is rolled back. inside a transaction()
+            # block, this becomes a savepoint
+            with self.transaction():
+                self._execute(sql, chunk, many=True)
+
+            count += len(chunk)
+
+    @instrumented
+    @write_operation
+    def update_record(self, table:str, primary_key, changes:dict, database:str=""):
+        """
+        Change the values of some columns of a record.
 
-    def get_record(self, table:str, primary_key, database:str=""):
-        """Get row data / record from a table using the primary key."""
+        Only the columns in changes are written. returns True if the record was
+        updated, or False if there is no record with the primary key.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("update_record() missing 1 required positional argument: 'database'")
+
+        if not isinstance(changes, dict):
+            raise TypeError("'changes' must be dict")
+
+        if not changes:
+            raise ValueError("'changes' must not be empty")
+
+        if database:
+            self.create_connection(database)
+
+        schema = self._get_schema()
+        validators = self._get_validators(table, schema)
+        table_primary_key = self._get_table_info(table, schema)[1]
+        if table_primary_key is None:
+            raise sqlite3.OperationalError("no primary key in table: {}".format(table))
+        for field, value in changes.items():
+            self._check_value(field, value, validators)
+
+        sql_cmd = "UPDATE " + table + " SET " + ", ".join(field + "=?" for field in changes) \
+            + " WHERE " + table_primary_key + "=?;"
+
+        updated = self._execute(sql_cmd, list(changes.values()) + [primary_key]).rowcount > 0
+        self._commit()
+
+        self._invalidate_records(table, primary_key, schema)
+        if table_primary_key in changes:
+            self._invalidate_records(table, changes[table_primary_key], schema)
+
+        return updated
+
+    @instrumented
+    @write_operation
+    def upsert_records(self, table:str, records, chunk_size:int=1000, database:str=""):
+        """
+        Add many records to a table, or replace the records with the same primary keys.
+
+        records are the same as add_records. one 'INSERT .. ON CONFLICT DO UPDATE'
+        command is executed with executemany in chunks of chunk_size, so existing
+        records are updated in place instead of deleted and added again. existing
+        records are updated only with the columns in the dicts (tuples have all the
+        columns). returns the number of added / updated records.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("upsert_records() missing 1 required positional argument: 'database'")
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than 0")
+
+        if sqlite3.sqlite_version_info < (3, 24, 0):
+            raise NotImplementedError(
+                "upsert_records needs SQLite 3.24.0 or newer, not " + sqlite3.sqlite_version)
+
+        if database:
+            self.create_connection(database)
+
+        schema = self._get_schema()
+        validators = self._get_validators(table, schema)
+        table_primary_key = self._get_table_info(table, schema)[1]
+        if table_primary_key is None:
+            raise sqlite3.OperationalError("no primary key in table: {}".format(table))
+
+        insert = "INSERT INTO " + table + " VALUES(" + ",".join("?" * len(validators)) \
+            + ") ON CONFLICT(" + table_primary_key + ") DO "
+        statements = {}
+
+        def statement(record):
+            """Get the upsert command that updates the columns of a record."""
+            columns = tuple(record) if isinstance(record, dict) else tuple(validators)
+            if columns not in statements:
+                updates = [column + "=excluded." + column
+                    for column in columns if column != table_primary_key]
+                statements[columns] = insert \
+                    + ("UPDATE SET " + ", ".join(updates) if updates else "NOTHING") + ";"
+            return statements[columns]
+
+        records = iter(records)
+        count = 0
+        try:
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    return count
+
+                # records next to each other with the same columns are one
+                # executemany, so the order of the records is kept
+                with self.transaction():
+                    for sql_cmd, group in groupby(chunk, statement):
+                        self._execute(sql_cmd,
+                            [self._record_values(record, validators) for record in group],
+                            many=True)
+
+                count += len(chunk)
+        finally:
+            self._invalidate_records(table)
+
+    @instrumented
+    def get_record(self, table:str, primary_key, database:str="", columns=None):
+        """
+        Get row data / record from a table using the primary key.
+
+        columns can be a list of column names to read, instead of all the columns.
+        records with selected columns are not cached by the record cache.
+        """
         if self.connection == "" and not database:
             raise TypeError("get_record() missing 1 required positional argument: 'database'")
 
         if database:
             self.create_connection(database)
 
-        if self.is_table(table_name=table, database=database):
-            cursor = self.connection.cursor()
+        schema = self._get_schema()
+        table_primary_key = self._get_table_info(table, schema)[1]
+        if table_primary_key is None:
+            raise sqlite3.OperationalError("no primary key in table: {}".format(table))
 
-            sql_cmd = "SELECT * FROM " + table + " WHERE " + self.get_primary_key(table=table, database=database) + "=?;"
-            fetch = cursor.execute(sql_cmd, (primary_key,))
+        columns, select = self._projection(table, columns, schema)
+        # the record cache has only records with all the columns
+        use_cache = self._record_cache is not None and select == "*"
 
-            # get columns list using get_columns
-            columns = self.get_columns(table=table, database=database)
-            record = {}
+        if use_cache:
+            self._check_data_version()
+            key = self._record_key(table, primary_key, schema)
+            record = self._record_cache.get(key)
+            if record is not RecordCache.MISSING:
+                # returns a copy. so the user cannot change the cached record
+                return dict(record) if isinstance(record, dict) else record
 
-            try:
-                for index, data in enumerate(fetch.fetchall()[0]):
-                    # this creates dictionary with column names and records
-                    record[columns[index]] = data
-            except IndexError:
-                # if the table does not have the requested data it returns
-                # a empty list. so above for loop will raise an IndexError.
-                return {}
+        sql_cmd = "SELECT " + select + " FROM " + table + " WHERE " + table_primary_key + "=?;"
+        rows = self._select(sql_cmd, (primary_key,)).fetchall()
 
-            return record
+        if rows:
+            record = self._make_records(rows, columns, table)[0]
+        else:
+            # if the table does not have the requested data it returns a empty
+            # dictionary (or None for other row formats)
+            record = {} if self.row_format == "dict" else None
 
-        # raise OperationalError if the given table not exists
-        raise sqlite3.OperationalError("no such table: {}".format(table))
+        if use_cache:
+            self._record_cache.put(key, dict(record) if isinstance(record, dict) else record)
+
+        return record
+
+    def enable_record_cache(self, size:int=1024, ttl:float=None):
+        """
+        Cache the records read by get_record.
+
+        size is the maximum number of cached records (least recently used records are
+        removed first) and ttl is the time to live of a record in seconds. cached
+        records are removed by add_record, delete_record and other writes, and
+        when 'PRAGMA data_version' shows a write from another connection.
+        """
+        if size < 1:
+            raise ValueError("size must be greater than 0")
+
+        self._record_cache = RecordCache(size=size, ttl=ttl)
+        self._data_versions = {}
+        return True
 
-    def get_all_records(self, table:str, database:str=""):
-        """Get all data / records of a table."""
+    def disable_record_cache(self):
+        """Stop caching the records read by get_record."""
+        self._record_cache = None
+        self._data_versions = {}
+        return True
+
+    def record_cache_stats(self):
+        """Get the hits, misses, evictions and size of the record cache."""
+        if self._record_cache is None:
+            raise NotImplementedError("call 'enable_record_cache' function before record_cache_stats")
+
+        return self._record_cache.stats()
+
+    def _check_data_version(self):
+        """Remove the cached records of the connection if another connection wrote to the database."""
+        version = self._execute("PRAGMA data_version;").fetchone()[0]
+
+        if self._data_versions.get(self.connection, version) != version:
+            self._record_cache.invalidate_all(self.connection)
+        self._data_versions[self.connection] = version
+
+    def _record_key(self, table:str, primary_key, schema=None):
+        """
+        Get the record cache key of a primary key.
+
+        Keys are converted to the type of the primary key column, like sqlite does,
+        so '1' and 1 are the same cached record of an INT column.
+        """
+        if schema is None:
+            schema = self._get_schema()
+        python_type = self._get_validators(table, schema)[self._get_table_info(table, schema)[1]]
+        return (self.connection, table, affinity_value(primary_key, python_type))
+
+    def _invalidate_records(self, table:str, primary_key=RecordCache.MISSING, schema=None):
+        """Remove a cached record, or all the cached records of a table."""
+        if self._record_cache is None:
+            return
+
+        if primary_key is RecordCache.MISSING:
+            self._record_cache.invalidate_all(self.connection, table)
+        else:
+            self._record_cache.invalidate(self._record_key(table, primary_key, schema))
+
+    def _forget_records(self, connection):
+        """Remove all the cached records and the data version of a connection."""
+        if self._record_cache is not None:
+            self._record_cache.invalidate_all(connection)
+        self._data_versions.pop(connection, None)
+
+    def _variable_limit(self):
+        """Get the maximum number of '?' parameters in one SQL command."""
+        try:
+            return self.connection.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        except AttributeError:
+            # Connection.getlimit is new in Python 3.11. 999 is the smallest
+            # default limit of the sqlite versions
+            return 999
+
+    @instrumented
+    def get_records(self,
+            table:str,
+            primary_keys,
+            preserve_order:bool=False,
+            report_missing:bool=False,
+            database:str=""):
+        """
+        Get many records from a table using a list of primary keys.
+
+        Keys are sent in chunks of 'WHERE primary_key IN (...)' commands. returns a
+        dictionary of records with the primary keys. if preserve_order is True, the
+        dictionary is in the order of primary_keys. if report_missing is True, the
+        list of primary keys that are not in the table is also returned. keys are
+        converted to the type of the primary key column like sqlite does, so '5'
+        finds the record 5 of an INT column.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("get_records() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        schema = self._get_schema()
+        column_types, table_primary_key = self._get_table_info(table, schema)
+        if table_primary_key is None:
+            raise sqlite3.OperationalError("no primary key in table: {}".format(table))
+
+        columns = list(column_types)
+        key_index = columns.index(table_primary_key)
+        python_type = self._get_validators(table, schema)[table_primary_key]
+
+        # stored values of the keys and the first given key of them. removes
+        # duplicate keys and keeps the order
+        given_keys = {}
+        for key in primary_keys:
+            given_keys.setdefault(affinity_value(key, python_type), key)
+        primary_keys = list(given_keys)
+        chunk_size = self._variable_limit()
+
+        records = {}
+        for start in range(0, len(primary_keys), chunk_size):
+            chunk = primary_keys[start:start + chunk_size]
+            sql_cmd = "SELECT * FROM " + table + " WHERE " + table_primary_key \
+                + " IN (" + ",".join("?" * len(chunk)) + ");"
+
+            rows = self._select(sql_cmd, chunk).fetchall()
+            for row, record in zip(rows, self._make_records(rows, columns, table)):
+                records[row[key_index]] = record
+
+        if preserve_order:
+            records = {key: records[key] for key in primary_keys if key in records}
+
+        if report_missing:
+            return records, [given_keys[key] for key in primary_keys if key not in records]
+
+        return records
+
+    @instrumented
+    def get_all_records(self, table:str, database:str="", columns=None):
+        """
+        Get all data / records of a table.
+
+        columns can be a list of column names to read, instead of all the columns.
+        """
         if self.connection == "" and not database:
             raise TypeError("get_all_records() missing 1 required positional argument: 'database'")
 
         if database:
             self.create_connection(database)
 
-        if self.is_table(table_name=table, database=database):
-            cursor = self.connection.cursor()
+        # get columns list from the schema cache
+        columns, select = self._projection(table, columns)
+
+        # rows are read from the cursor one by one, without fetchall
+        cursor = self._select("SELECT " + select + " FROM " + table)
+        return self._make_records(cursor, columns, table)
+
+    def _get_page(self, connection, table:str, columns:list, keyset:str, after, limit:int):
+        """
+        Get the next page of records after the given keyset value.
+
+        Returns the records and the keyset value of the last record. if the keyset
+        is the rowid, it is selected as the first column and not added to records.
+        """
+        sql_cmd = "SELECT "
+        if keyset == "rowid":
+            sql_cmd += "rowid, "
+        sql_cmd += "* FROM " + table
+        params = []
+
+        if after is not None:
+            sql_cmd += " WHERE " + keyset + ">?"
+            params.append(after)
+
+        sql_cmd += " ORDER BY " + keyset + " LIMIT ?;"
+        params.append(limit)
+
+        rows = self._select(sql_cmd, params, connection).fetchall()
+        if not rows:
+            return [], None
+
+        if keyset == "rowid":
+            last = rows[-1][0]
+            rows = [tuple(row)[1:] for row in rows]
+            if self.row_format == "row":
+                # sqlite3.Row objects need a cursor with the column names
+                cursor = connection.execute("SELECT * FROM " + table + " LIMIT 0;")
+                rows = [sqlite3.Row(cursor, row) for row in rows]
+        else:
+            last = rows[-1][columns.index(keyset)]
+
+        return self._make_records(rows, columns, table), last
+
+    def _iter_pages(self, connection, table:str, columns:list, keyset:str, batch_size:int):
+        """Yield records page by page using keyset pagination."""
+        after = None
+        while True:
+            records, after = self._get_page(connection, table, columns, keyset, after, batch_size)
+            yield from records
+
+            if len(records) < batch_size:
+                return
+
+    def _iter_cursor(self, cursor, columns:list, table:str, batch_size:int):
+        """Yield records from a cursor using fetchmany."""
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+
+            yield from self._make_records(rows, columns, table)
+
+    @instrumented
+    def iter_records(self,
+            table:str,
+            batch_size:int=1000,
+            order_by:str="",
+            database:str=""):
+        """
+        Get all data / records of a table one by one, using a generator.
+
+        Only batch_size rows are in memory at a time. if order_by is not defined,
+        records are read page by page in primary key order (or rowid order, if the
+        primary key can be NULL), so the table is not locked between the pages. else, records are read from one cursor ordered
+        by the given column.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("iter_records() missing 1 required positional argument: 'database'")
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0")
+
+        if database:
+            self.create_connection(database)
+
+        schema = self._get_schema()
+        columns = list(self._get_table_info(table, schema)[0])
 
-            sql_cmd = "SELECT * FROM " + table
-            cursor.execute(sql_cmd)
-            rows = cursor.fetchall()
+        if not order_by:
+            keyset = schema["keysets"][table]
+            return self._iter_pages(self.connection, table, columns, keyset, batch_size)
 
-            # get columns list using get_columns
-            columns = self.get_columns(table=table, database=database)
-            records = []
-            tmp_dict = {}
+        if order_by not in columns:
+            raise sqlite3.OperationalError("no such column: {}".format(order_by))
 
-            for row in rows:
-                for index, data in enumerate(row):
-                    # this creates dictionary with column names and records
-                    tmp_dict[columns[index]] = data
-                records.append(tmp_dict)
-                tmp_dict = {}
+        cursor = self._select("SELECT * FROM " + table + " ORDER BY " + order_by)
+        return self._iter_cursor(cursor, columns, table, batch_size)
 
-            return records
+    @instrumented
+    def get_records_page(self, table:str, after=None, limit:int=100, database:str=""):
+        """
+        Get a page of records from a table, ordered like iter_records.
 
-        # raise OperationalError if the given table not exists
-        raise sqlite3.OperationalError("no such table: {}".format(table))
+        Returns the records list and the value for the 'after' parameter of the next
+        page. for the first page, 'after' must be None. if there are no more records
+        the records list is empty.
+        """
+        if self.connection == "" and not database:
+            raise TypeError(
+                "get_records_page() missing 1 required positional argument: 'database'")
+
+        if limit < 1:
+            raise ValueError("limit must be greater than 0")
+
+        if database:
+            self.create_connection(database)
+
+        schema = self._get_schema()
+        columns = list(self._get_table_info(table, schema)[0])
+        keyset = schema["keysets"][table]
 
+        return self._get_page(self.connection, table, columns, keyset, after, limit)
+
+    @instrumented
+    @write_operation
     def delete_record(self, table:str, primary_key, database:str=""):
         """Delete record from a table."""
         if self.connection == "" and not database:
@@ -357,22 +1695,152 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        if self.is_table(table_name=table, database=database):
-            cursor = self.connection.cursor()
-            sql = "DELETE FROM " + table + " WHERE " + self.get_primary_key(table=table, database=database) + "=?"
-            cursor.execute(sql, (primary_key,))
-            self.connection.commit()
+        schema = self._get_schema()
+        table_primary_key = self._get_table_info(table, schema)[1]
+        if table_primary_key is None:
+            raise sqlite3.OperationalError("no primary key in table: {}".format(table))
 
-            return True
+        sql = "DELETE FROM " + table + " WHERE " + table_primary_key + "=?"
+        self._execute(sql, (primary_key,))
+        self._commit()
+        self._invalidate_records(table, primary_key, schema)
 
-        # raise OperationalError if the given table not exists
-        raise sqlite3.OperationalError("no such table: {}".format(table))
+        return True
+
+    @instrumented
+    @write_operation
+    def delete_records(self, table:str, primary_keys, database:str=""):
+        """
+        Delete many records from a table using a list of primary keys.
 
-    def filter_records(self, table:str, values:dict, database:str=""):
+        Keys are sent in chunks of 'WHERE primary_key IN (...)' commands and all the
+        chunks are one transaction. returns the number of deleted records.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("delete_records() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        schema = self._get_schema()
+        table_primary_key = self._get_table_info(table, schema)[1]
+        if table_primary_key is None:
+            raise sqlite3.OperationalError("no primary key in table: {}".format(table))
+
+        # removes duplicate keys and keeps the order
+        primary_keys = list(dict.fromkeys(primary_keys))
+        chunk_size = self._variable_limit()
+
+        count = 0
+        with self.transaction():
+            for start in range(0, len(primary_keys), chunk_size):
+                chunk = primary_keys[start:start + chunk_size]
+                sql_cmd = "DELETE FROM " + table + " WHERE " + table_primary_key \
+                    + " IN (" + ",".join("?" * len(chunk)) + ");"
+                count += self._execute(sql_cmd, chunk).rowcount
+
+        for primary_key in primary_keys:
+            self._invalidate_records(table, primary_key, schema)
+
+        return count
+
+    @instrumented
+    @write_operation
+    def delete_where(self, table:str, values:dict, database:str=""):
+        """
+        Delete the records that match a filter.
+
+        values is the same as filter_records and the values are bound as
+        parameters. an empty filter is not accepted (use delete_table). returns the
+        number of deleted records.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("delete_where() missing 1 required positional argument: 'database'")
+
+        if not values:
+            raise ValueError("'values' must not be empty")
+
+        if database:
+            self.create_connection(database)
+
+        columns = list(self._get_table_info(table)[0])
+
+        params = []
+        sql_cmd = "DELETE FROM " + table + " WHERE " \
+            + filter_sql(filter_shape(values, params), columns) + ";"
+
+        count = self._execute(sql_cmd, params).rowcount
+        self._commit()
+        self._invalidate_records(table)
+
+        return count
+
+    def _compile_filter(self,
+            table:str,
+            columns:list,
+            values:dict,
+            order_by="",
+            limit:int=None,
+            offset:int=None,
+            select:str="*",
+            group_by:str=""):
+        """
+        Create the SELECT command and the parameters of a filter.
+
+        Values are always bound as parameters. SQL commands are cached by the table
+        and the filter shape, so the same filter with other values reuses the SQL
+        command and sqlite reuses the prepared statement.
+        """
+        params = []
+        shape = filter_shape(values or {}, params)
+
+        if isinstance(order_by, list):
+            order_by = tuple(order_by)
+        key = (table, select, shape, group_by, order_by, limit is not None, offset is not None)
+
+        with self._filter_lock:
+            sql = self._filter_cache.get(key)
+            if sql is not None:
+                self._filter_cache.move_to_end(key)
+
+        if sql is None:
+            sql = "SELECT " + select + " FROM " + table + " WHERE " + filter_sql(shape, columns)
+            if group_by:
+                sql += " GROUP BY " + group_by
+            if order_by:
+                sql += " ORDER BY " + order_by_sql(order_by, columns)
+            if limit is not None or offset is not None:
+                # sqlite needs a LIMIT for OFFSET. -1 means no limit
+                sql += " LIMIT ? OFFSET ?"
+            sql += ";"
+
+            with self._filter_lock:
+                self._filter_cache[key] = sql
+                if len(self._filter_cache) > self.filter_cache_size:
+                    self._filter_cache.popitem(last=False)
+
+        if limit is not None or offset is not None:
+            params.extend((-1 if limit is None else limit, offset or 0))
+
+        return sql, params
+
+    @instrumented
+    def filter_records(self,
+            table:str,
+            values:dict,
+            database:str="",
+            order_by="",
+            limit:int=None,
+            offset:int=None,
+            columns=None):
         """
         Get filtered record list from a table.
 
-        This will return one or more records by checking the values.
+        This will return one or more records by checking the values. values can
+        use operators like {"mark": {"ge": 10}} (eq, ne, lt, le, gt, ge, between,
+        in, like, is_null) and OR groups like {"or": [{..}, {..}]}. order_by can be
+        a column name or a list of column names ('-' for descending order). columns
+        can be a list of column names to read, instead of all the columns.
         """
         if self.connection == "" and not database:
             raise TypeError("filter_records() missing 1 required positional argument: 'database'")
@@ -380,49 +1848,610 @@ class ReallySimpleDB:
         if database:
             self.create_connection(database)
 
-        if self.is_table(table_name=table, database=database):
-            cursor = self.connection.cursor()
+        # get columns list from the schema cache. raises OperationalError if
+        # the given table not exists
+        schema = self._get_schema()
+        table_columns = list(self._get_table_info(table, schema)[0])
+        columns, select = self._projection(table, columns, schema)
+
+        sql, params = self._compile_filter(table, table_columns, values, order_by, limit, offset,
+            select=select)
+
+        if self._index_advisor is not None:
+            self._advise_index(table, values, sql, params)
+
+        cursor = self._select(sql, params)
+        return self._make_records(cursor, columns, table)
+
+    @instrumented
+    def parallel_scan(self,
+            table:str,
+            values:dict=None,
+            map_function=None,
+            reduce_function=None,
+            processes:int=None,
+            partitions:int=None,
+            database:str=""):
+        """
+        Filter all the records of a table using many processes.
+
+        The table is split into rowid ranges and every partition is read by a worker
+        process with its own read-only connection. values uses the filter_records
+        values format. records are dictionaries and map_function is called with every
+        record in the workers. if reduce_function is defined, the values of every
+        partition and then the partition results are reduced to one value (None if
+        there are no records). else, returns the list of (mapped) records in rowid
+        order. map_function and reduce_function must be picklable (module level
+        functions). writes that are not committed are not seen by the workers.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("parallel_scan() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        # path of the main database of the connection. empty for in-memory databases
+        path = self.connection.execute("PRAGMA database_list;").fetchone()[2]
+        if not path:
+            raise ValueError("parallel scans need a database file")
+
+        processes = processes or os.cpu_count() or 1
+        partitions = partitions or processes
+        if processes < 1 or partitions < 1:
+            raise ValueError("processes and partitions must be greater than 0")
+
+        columns = list(self._get_table_info(table)[0])
+        params = []
+        where = filter_sql(filter_shape(values or {}, params), columns)
+        sql = "SELECT * FROM " + table + " WHERE rowid BETWEEN ? AND ? AND (" + where + ");"
+
+        low, high = self._execute("SELECT MIN(rowid), MAX(rowid) FROM " + table + ";").fetchone()
+        if low is None:
+            return None if reduce_function is not None else []
+
+        size = -(-(high - low + 1) // partitions)
+        ranges = [(start, min(start + size - 1, high)) for start in range(low, high + 1, size)]
+
+        with ProcessPoolExecutor(max_workers=min(processes, len(ranges))) as executor:
+            futures = [executor.submit(scan_partition, path, sql, [start, end] + params,
+                columns, map_function, reduce_function) for start, end in ranges]
+            results = [future.result() for future in futures]
+
+        if reduce_function is None:
+            return [record for result in results for record in result]
+
+        reduced = [value for found, value in results if found]
+        return reduce(reduce_function, reduced) if reduced else None
+
+    @instrumented
+    def count(self, table:str, where:dict=None, database:str=""):
+        """
+        Get the number of records in a table, or the number of records that match a filter.
 
-            operators = [">", "<", "!", "="]
+        where uses the filter_records values format. records are counted by sqlite
+        and not read.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("count() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        columns = list(self._get_table_info(table)[0])
+        sql, params = self._compile_filter(table, columns, where, select="COUNT(*)")
+
+        return self._execute(sql, params).fetchone()[0]
+
+    @instrumented
+    def exists(self, table:str, where:dict, database:str=""):
+        """
+        Check if a table has a record that matches a filter.
+
+        where uses the filter_records values format. sqlite stops at the first
+        matching record.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("exists() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
 
-            sql = "SELECT * FROM " + table + " WHERE "
+        columns = list(self._get_table_info(table)[0])
+        sql, params = self._compile_filter(table, columns, where, limit=1, select="1")
 
-            for value in values:
+        return self._execute(sql, params).fetchone() is not None
+
+    @instrumented
+    def aggregate(self,
+            table:str,
+            functions:dict,
+            group_by=None,
+            where:dict=None,
+            database:str=""):
+        """
+        Calculate count, sum, total, min, max or avg of columns inside sqlite.
+
+        functions is a dictionary of columns and function names, like {"mark": "avg"}
+        or {"mark": ["min", "max"], "*": "count"}. results are named like
+        'avg(mark)'. if group_by (a column name or a list of column names) is not
+        defined, returns one dictionary. else, returns a list of dictionaries with the
+        group_by columns, ordered by them. where uses the filter_records values format.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("aggregate() missing 1 required positional argument: 'database'")
+
+        if not functions:
+            raise ValueError("'functions' must not be empty")
+
+        if database:
+            self.create_connection(database)
+
+        columns = list(self._get_table_info(table)[0])
+
+        if group_by is None:
+            group_by = []
+        elif isinstance(group_by, str):
+            group_by = [group_by]
+
+        for column in group_by:
+            if column not in columns:
+                raise sqlite3.OperationalError("no such column: {}".format(column))
+
+        names = list(group_by)
+        select = list(group_by)
+        for column, column_functions in functions.items():
+            if isinstance(column_functions, str):
+                column_functions = [column_functions]
+
+            for function in column_functions:
+                if function not in AGGREGATE_FUNCTIONS:
+                    raise ValueError("aggregate function not supported, '{}'".format(function))
+                # '*' can be used only for counting all the records
+                if column not in columns and not (column == "*" and function == "count"):
+                    raise sqlite3.OperationalError("no such column: {}".format(column))
+
+                names.append(function + "(" + column + ")")
+                select.append(AGGREGATE_FUNCTIONS[function] + "(" + column + ")")
+
+        sql, params = self._compile_filter(table, columns, where, order_by=tuple(group_by),
+            select=", ".join(select), group_by=", ".join(group_by))
+        rows = self._execute(sql, params).fetchall()
+
+        if not group_by:
+            return dict(zip(names, rows[0]))
+
+        return [dict(zip(names, row)) for row in rows]
+
+    @instrumented
+    def get_columns_data(self,
+            table:str,
+            columns,
+            where:dict=None,
+            batch_size:int=10000,
+            as_numpy:bool=True,
+            null=None,
+            database:str=""):
+        """
+        Get the values of one or more columns as arrays.
+
+        Integer and real columns are read into array.array buffers ('q' and 'd'), so
+        every value uses 8 bytes instead of a python object in a dictionary. if NumPy
+        is installed and as_numpy is True, they are returned as NumPy arrays. other
+        columns are returned as lists. where uses the filter_records values format.
+        returns a dictionary of arrays with the column names.
+
+        Arrays cannot have NULL values. null is the value used for them in integer
+        and real columns. if null is None, NaN is used in real columns and NULL
+        values in integer columns raise TypeError.
+        """
+        if self.connection == "" and not database:
+            raise TypeError(
+                "get_columns_data() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        if isinstance(columns, str):
+            columns = [columns]
+
+        schema = self._get_schema()
+        table_columns = list(self._get_table_info(table, schema)[0])
+        validators = self._get_validators(table, schema)
+        for column in columns:
+            if column not in table_columns:
+                raise sqlite3.OperationalError("no such column: {}".format(column))
+
+        data = {}
+        fills = {}
+        for column in columns:
+            if validators[column] in ARRAY_TYPES:
+                data[column] = array(ARRAY_TYPES[validators[column]])
+                fills[column] = float("nan") if null is None and validators[column] is float \
+                    else null
+            else:
+                data[column] = []
+
+        sql, params = self._compile_filter(table, table_columns, where,
+            select=", ".join(columns))
+        cursor = self._execute(sql, params)
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            for column, values in zip(columns, zip(*rows)):
+                if fills.get(column) is not None and None in values:
+                    values = [fills[column] if value is None else value for value in values]
                 try:
-                    # if value is in string type
-                    # checks for if value contains any special character
-                    if any(c in operators for c in values[value]):
-                        sql += value + values[value] + " AND "
-                    else:
-                        sql += value + "='" + values[value] + "' AND "
+                    data[column].extend(values)
+                except TypeError as error:
+                    if None in values:
+                        raise TypeError("'{}' column has NULL values, use null= to fill them"
+                            .format(column)) from error
+                    raise TypeError("'{}' column has values that are not '{}': {}"
+                        .format(column, validators[column], error)) from error
+
+        if as_numpy and numpy is not None:
+            for column in columns:
+                if isinstance(data[column], array):
+                    data[column] = numpy.frombuffer(data[column], dtype=data[column].typecode)
+
+        return data
+
+    @instrumented
+    @write_operation
+    def import_file(self,
+            table:str,
+            path:str,
+            format:str="",
+            chunk_size:int=10000,
+            create_table:bool=False,
+            primary_key:str="",
+            sample_size:int=1000,
+            database:str=""):
+        """
+        Add the records of a CSV or JSON Lines file to a table.
+
+        The file is read record by record and inserted in chunks of chunk_size, so
+        only one chunk is in memory. format is 'csv' or 'jsonl' (default: the
+        file extension). values are converted to the data types of the columns and
+        empty values are NULL. if create_table is True and the table does not exist,
+        it is created with the CSV header / JSON keys of the first sample_size records
+        and their INT, REAL or TEXT types. returns the number of added records.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("import_file() missing 1 required positional argument: 'database'")
 
-                except TypeError:
-                    # if value is in int or float type
-                    sql += value + "=" + str(values[value]) + " AND "
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than 0")
 
-            # removes unnecessary characters and completes the SQL command
-            sql = sql[:-5] + ";"
+        format_name = file_format(path, format)
 
-            cursor.execute(sql)
-            rows = cursor.fetchall()
+        if database:
+            self.create_connection(database)
 
-            columns = self.get_columns(table=table, database=database)
-            records = []
-            tmp_dict = {}
+        records = read_file(path, format_name)
+        count = 0
+
+        try:
+            if create_table and not self.is_table(table_name=table):
+                sample = list(islice(records, sample_size))
+                records = chain(sample, records)
+                # the new table is removed if the first chunk cannot be added
+                with self.transaction():
+                    self._create_file_table(table, sample, primary_key, format_name == "csv")
+                    count = self._insert_file_records(table, islice(records, chunk_size),
+                        chunk_size)
+
+            count += self._insert_file_records(table, records, chunk_size)
+        finally:
+            self._invalidate_records(table)
+
+        return count
+
+    def _insert_file_records(self, table:str, records, chunk_size:int):
+        """Convert the records of import_file to the column types and insert them in chunks."""
+        validators = self._get_validators(table)
+        positions = {column: index for index, column in enumerate(validators)}
+
+        def values(record):
+            row = [None] * len(positions)
+            for field, value in record.items():
+                # if the file has a column that is not in the table..
+                if field not in positions:
+                    raise NameError("'{}' column is not in the table".format(field))
+                row[positions[field]] = coerce_value(field, value, validators[field])
+            return row
+
+        sql_cmd = "INSERT INTO " + table + " VALUES(" + ",".join("?" * len(positions)) + ");"
+
+        return self._execute_chunks(sql_cmd, map(values, records), chunk_size)
+
+    def _create_file_table(self, table:str, sample:list, primary_key:str, parse_strings:bool):
+        """Create a table for import_file with the columns and inferred types of sample records."""
+        columns = list(dict.fromkeys(field for record in sample for field in record))
+        if not columns:
+            raise ValueError("cannot create a table from an empty file")
+
+        if primary_key and primary_key not in columns:
+            raise sqlite3.OperationalError("no such column: {}".format(primary_key))
+
+        definitions = []
+        for column in columns:
+            # column names are used in SQL commands without quotes
+            if not isinstance(column, str) or not column.isidentifier():
+                raise ValueError("column name not supported, '{}'".format(column))
+
+            datatype = infer_datatype(
+                [record.get(column) for record in sample], parse_strings=parse_strings)
+            definitions.append(column + " " + datatype
+                + (" PRIMARY KEY" if column == primary_key else ""))
+
+        self._execute("CREATE TABLE " + table + " (" + ", ".join(definitions) + ")")
+        self._clear_schema()
+
+    @instrumented
+    def export_file(self,
+            table:str,
+            path:str,
+            where:dict=None,
+            format:str="",
+            batch_size:int=10000,
+            database:str=""):
+        """
+        Write the records of a table to a CSV or JSON Lines file.
 
-            for row in rows:
-                for index, data in enumerate(row):
-                    # this creates dictionary with column names and records
-                    tmp_dict[columns[index]] = data
-                records.append(tmp_dict)
-                tmp_dict = {}
+        Records are read from one cursor in batches of batch_size and written one by
+        one, so only one batch is in memory. where uses the filter_records values
+        format. format is 'csv' or 'jsonl' (default: the file extension). NULL
+        values are empty CSV values. returns the number of written records.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("export_file() missing 1 required positional argument: 'database'")
 
-            return records
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0")
 
-        # raise OperationalError if the given table not exists
-        raise sqlite3.OperationalError("no such table: {}".format(table))
+        format_name = file_format(path, format)
+
+        if database:
+            self.create_connection(database)
+
+        columns = list(self._get_table_info(table)[0])
+        sql, params = self._compile_filter(table, columns, where)
+        cursor = self._execute(sql, params)
+
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            if format_name == "csv":
+                writer = csv.writer(file)
+                writer.writerow(columns)
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                if format_name == "csv":
+                    writer.writerows(rows)
+                else:
+                    file.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False)
+                        + "\n" for row in rows)
+
+                count += len(rows)
+
+        return count
+
+    @instrumented
+    @write_operation
+    def create_index(self,
+            table:str,
+            columns,
+            index_name:str="",
+            unique:bool=False,
+            if_not_exists:bool=False,
+            database:str=""):
+        """
+        Create an index on one or more columns of a table.
+
+        columns can be a column name or a list of column names (composite index). if
+        index_name is not defined, it is created using the table and column names.
+        if if_not_exists is True, an existing index with the same name is not an
+        error. returns the index name.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("create_index() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        if isinstance(columns, str):
+            columns = [columns]
+
+        table_columns = self._get_table_info(table)[0]
+        for column in columns:
+            if column not in table_columns:
+                raise sqlite3.OperationalError("no such column: {}".format(column))
+
+        if not index_name:
+            index_name = "idx_" + table + "_" + "_".join(columns)
+
+        sql_cmd = "CREATE UNIQUE INDEX " if unique else "CREATE INDEX "
+        if if_not_exists:
+            sql_cmd += "IF NOT EXISTS "
+        sql_cmd += index_name + " ON " + table + " (" + ", ".join(columns) + ");"
+
+        self._execute(sql_cmd)
+        self._clear_schema()
+        return index_name
+
+    @instrumented
+    @write_operation
+    def drop_index(self, index_name:str, database:str=""):
+        """Delete an index from the database."""
+        if self.connection == "" and not database:
+            raise TypeError("drop_index() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        self._execute("DROP INDEX " + index_name + ";")
+        self._clear_schema()
+        return True
+
+    @instrumented
+    def list_indexes(self, table:str="", database:str=""):
+        """
+        Get a list of the indexes in the database, or in a table.
+
+        Every index is a dictionary with the name, table, columns and unique keys.
+        indexes created by sqlite for primary keys and unique columns are included.
+        """
+        if self.connection == "" and not database:
+            raise TypeError("list_indexes() missing 1 required positional argument: 'database'")
+
+        if database:
+            self.create_connection(database)
+
+        if table:
+            # raise OperationalError if the given table not exists
+            self._get_table_info(table)
+            tables = [table]
+        else:
+            tables = self._get_tables()
+
+        indexes = []
+        for table_name in tables:
+            sql_cmd = "PRAGMA INDEX_LIST(" + table_name + ");"
+            for index in self._execute(sql_cmd).fetchall():
+                sql_cmd = "PRAGMA INDEX_INFO(" + index[1] + ");"
+                columns = [info[2] for info in self._execute(sql_cmd)]
+                indexes.append({"name": index[1], "table": table_name,
+                    "columns": columns, "unique": bool(index[2])})
+
+        return indexes
+
+    def enable_index_advisor(self, auto_create:bool=False, min_uses:int=1):
+        """
+        Start recording the columns used by filter_records.
+
+        When the query plan of a filter scans the whole table, the filtered columns
+        are suggested for an index (see suggest_indexes). if auto_create is True,
+        the index is created after min_uses filters on the same columns.
+        """
+        self._index_advisor = {"auto_create": auto_create, "min_uses": min_uses,
+            "usage": {}}
+        return True
+
+    def disable_index_advisor(self):
+        """Stop recording the columns used by filter_records."""
+        self._index_advisor = None
+        return True
+
+    def _advise_index(self, table:str, values:dict, sql:str, params:list):
+        """
+        Record the filtered columns and check the query plan for full table scans.
+
+        The query plan of the same columns is checked only once. indexes are not
+        suggested / created when an index starting with the columns exists. errors
+        are saved in the usage of the columns and never raised, so the advisor
+        cannot make a read fail.
+        """
+        # equality columns first, then one range column. this is the column order
+        # that can be used by one index. OR groups, like, ne and IS NOT NULL
+        # conditions cannot use an index and are not checked
+        shape = filter_shape(values or {}, [])
+        columns = []
+        for condition in shape:
+            if condition[0] != "or" and condition[0] not in columns \
+                and (condition[1] in ("eq", "in") or condition[1:] == ("is_null", True)):
+                columns.append(condition[0])
+        for condition in shape:
+            if condition[0] != "or" and condition[0] not in columns \
+                and condition[1] in ("lt", "le", "gt", "ge", "between"):
+                columns.append(condition[0])
+                break
+
+        if not columns:
+            return
+
+        key = (table, tuple(columns))
+        usage = self._index_advisor["usage"].get(key)
+        if usage is None:
+            usage = {"uses": 0, "scan": False}
+            self._index_advisor["usage"][key] = usage
+            try:
+                plan = self.connection.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                # plan details are like 'SCAN STUDENTS' or 'SEARCH STUDENTS USING INDEX ..'
+                scan = any(step[-1].startswith("SCAN") for step in plan)
+                usage["scan"] = scan and not self._has_index(table, columns)
+            except sqlite3.Error as error:
+                usage["error"] = str(error)
+
+        usage["uses"] += 1
+
+        if usage["scan"] and "error" not in usage and self._index_advisor["auto_create"] \
+            and usage["uses"] >= self._index_advisor["min_uses"]:
+            try:
+                # the index may be created after the query plan was checked
+                if not self._has_index(table, columns):
+                    self.create_index(table=table, columns=columns,
+                        index_name=self._free_index_name(table, columns), if_not_exists=True)
+                usage["scan"] = False
+            except sqlite3.Error as error:
+                # the index is suggested again and not created by the next filters
+                usage["error"] = str(error)
+
+    def _free_index_name(self, table:str, columns:list):
+        """Get an index name of the columns that is not used by other indexes."""
+        sql_cmd = "SELECT name FROM sqlite_master WHERE type='index';"
+        names = {row[0].lower() for row in self._execute(sql_cmd)}
+
+        index_name = "idx_" + table + "_" + "_".join(columns)
+        number = 1
+        while index_name.lower() in names:
+            number += 1
+            index_name = "idx_" + table + "_" + "_".join(columns) + "_" + str(number)
+
+        return index_name
+
+    def _has_index(self, table:str, columns:list):
+        """Check if the table has an index that starts with the columns."""
+        return any(index["columns"][:len(columns)] == columns
+            for index in self.list_indexes(table=table))
+
+    def suggest_indexes(self, table:str=""):
+        """
+        Get the indexes suggested by the index advisor.
+
+        Returns a list of dictionaries with the table, columns and number of uses.
+        most used columns are first. if auto_create could not create the index, the
+        error message is in 'error'.
+        """
+        if self._index_advisor is None:
+            raise NotImplementedError("call 'enable_index_advisor' function before suggest_indexes")
+
+        suggestions = []
+        for (table_name, columns), usage in self._index_advisor["usage"].items():
+            if usage["scan"] and usage["uses"] >= self._index_advisor["min_uses"] \
+                and table in ("", table_name):
+                suggestion = {"table": table_name, "columns": list(columns),
+                    "uses": usage["uses"]}
+                if "error" in usage:
+                    suggestion["error"] = usage["error"]
+                suggestions.append(suggestion)
+
+        return sorted(suggestions, key=lambda suggestion: -suggestion["uses"])
 
     def close_connection(self):
         """Close the connection with the SQLite database file."""
+        for path in self._connections:
+            if self._connections[path][0] is self.connection:
+                self._close_pooled(path)
+                return True
+
+        self._clear_schema()
+        self._forget_records(self.connection)
         self.connection.close()
         return True
@@ -0,0 +1,320 @@
+import zlib
+
+from bisect             import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from .manager   import ReallySimpleDB
+
+def _sort_key(column:str):
+    """Get the sort key function of a column. NULL values are first, like in sqlite."""
+    def key(record):
+        value = record[column]
+        return (value is not None, value)
+
+    return key
+
+class ShardedReallySimpleDB:
+    """
+    ShardedReallySimpleDB class.
+
+    ShardedReallySimpleDB objects split the records of tables into many database
+    files (shards) by the primary key. every shard has its own ReallySimpleDB object
+    and its own thread, so writes to different shards run in parallel. records of one
+    primary key are always in the same shard.
+    """
+
+    def __init__(self,
+            paths:list,
+            strategy:str="hash",
+            boundaries:list=None,
+            **kwargs) -> None:
+        """
+        Create a object and open the shard databases.
+
+        paths are the database files of the shards. with the 'hash' strategy primary
+        keys are spread using a CRC32 hash. with the 'range' strategy boundaries is a
+        sorted list of len(paths) - 1 primary keys, and keys less than boundaries[0]
+        are in the first shard, and so on. other arguments are sent to
+        ReallySimpleDB. records are dictionaries.
+        """
+        if not paths:
+            raise ValueError("'paths' must not be empty")
+
+        if strategy == "hash":
+            if boundaries is not None:
+                raise ValueError("boundaries are used only with the 'range' strategy")
+        elif strategy == "range":
+            if boundaries is None or len(boundaries) != len(paths) - 1:
+                raise ValueError("'range' strategy needs {} boundaries".format(len(paths) - 1))
+            if list(boundaries) != sorted(boundaries):
+                raise ValueError("boundaries must be sorted")
+        else:
+            raise ValueError("sharding strategy not supported, '{}'".format(strategy))
+
+        if kwargs.get("row_format", "dict") != "dict":
+            raise ValueError("sharded databases support only the 'dict' row format")
+
+        self.paths = list(paths)
+        self.strategy = strategy
+        self.boundaries = list(boundaries) if boundaries is not None else None
+        self._shards = [ReallySimpleDB(**kwargs) for _ in self.paths]
+        # primary keys and column lists of the tables. routed writes do not have to
+        # wait for the thread of the first shard
+        self._tables = {}
+        self._executors = [ThreadPoolExecutor(max_workers=1,
+            thread_name_prefix="ReallySimpleDB-shard-" + str(index))
+            for index in range(len(self.paths))]
+
+        # connections are opened on the shard threads. sqlite connections can be
+        # used only by the thread that opened them
+        self._run_all("create_connection", args=lambda index: (self.paths[index],))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def shard_index(self, primary_key):
+        """Get the index of the shard that has the records of a primary key."""
+        if self.strategy == "range":
+            return bisect_right(self.boundaries, primary_key)
+
+        # python hash() of strings changes in every process. CRC32 is the same
+        return zlib.crc32(repr(primary_key).encode("utf-8")) % len(self._shards)
+
+    def _submit(self, index:int, name:str, *args, **kwargs):
+        """Run a ReallySimpleDB method on the thread of a shard. returns a future."""
+        return self._executors[index].submit(getattr(self._shards[index], name), *args, **kwargs)
+
+    def _run(self, index:int, name:str, *args, **kwargs):
+        """Run a ReallySimpleDB method on the thread of a shard and wait for the result."""
+        return self._submit(index, name, *args, **kwargs).result()
+
+    def _run_all(self, name:str, args=None, indexes=None, **kwargs):
+        """
+        Run a ReallySimpleDB method on many shards in parallel and get the results list.
+
+        args is a function that gets the positional arguments of a shard index.
+        indexes are the shards to use (default: all the shards).
+        """
+        if indexes is None:
+            indexes = range(len(self._shards))
+
+        futures = [self._submit(index, name, *(args(index) if args else ()), **kwargs)
+            for index in indexes]
+        return [future.result() for future in futures]
+
+    def _table_info(self, table:str):
+        """Get the primary key and the columns list of a table from the table cache."""
+        info = self._tables.get(table)
+        if info is None:
+            info = (self._run(0, "get_primary_key", table=table),
+                self._run(0, "get_columns", table=table))
+            self._tables[table] = info
+        return info
+
+    def _group_by_shard(self, primary_keys):
+        """Group primary keys by the index of their shard."""
+        groups = {}
+        for primary_key in primary_keys:
+            groups.setdefault(self.shard_index(primary_key), []).append(primary_key)
+        return groups
+
+    def add_columns(self,
+            column_name:str,
+            datatype:str="TEXT",
+            primary_key:bool=False,
+            not_null:bool=False,
+            table:str=""):
+        """
+        Add columns to an existing table / define columns before creating a table.
+
+        Same as ReallySimpleDB.add_columns(), for all the shards.
+        """
+        futures = [self._submit(index, "add_columns", column_name=column_name,
+            datatype=datatype, primary_key=primary_key, not_null=not_null,
+            database=self.paths[index] if table else "", table=table)
+            for index in range(len(self._shards))]
+        try:
+            return all(future.result() for future in futures)
+        finally:
+            self._tables.pop(table, None)
+
+    def clean(self):
+        """Clean add_columns data of all the shards."""
+        return all(self._run_all("clean"))
+
+    def create_table(self, table_name:str):
+        """Create new table in all the shards. the table must have a primary key."""
+        try:
+            return all(self._run_all("create_table", table_name=table_name))
+        finally:
+            self._tables.pop(table_name, None)
+
+    def delete_table(self, table:str):
+        """Delete a table from all the shards."""
+        try:
+            return all(self._run_all("delete_table", table=table))
+        finally:
+            self._tables.pop(table, None)
+
+    def create_index(self, table:str, columns, index_name:str="", unique:bool=False):
+        """Create an index in all the shards. unique indexes are unique only in a shard."""
+        return self._run_all("create_index", table=table, columns=columns,
+            index_name=index_name, unique=unique)[0]
+
+    def drop_index(self, index_name:str):
+        """Delete an index from all the shards."""
+        return all(self._run_all("drop_index", index_name=index_name))
+
+    def all_tables(self):
+        """Get a list of all the tables in the database."""
+        return self._run(0, "all_tables")
+
+    def is_table(self, table_name:str):
+        """Check if the given table is exists in the database."""
+        return self._run(0, "is_table", table_name=table_name)
+
+    def get_all_column_types(self, table:str):
+        """Get all the column names with the data types in a table."""
+        return self._run(0, "get_all_column_types", table=table)
+
+    def get_columns(self, table:str):
+        """Get all the column names list in a table."""
+        return list(self._table_info(table)[1])
+
+    def get_primary_key(self, table:str):
+        """Find and get primary key of a table."""
+        return self._table_info(table)[0]
+
+    def add_record(self, table:str, record:dict):
+        """Add a new record to the shard of its primary key."""
+        if not isinstance(record, dict):
+            raise TypeError("'record' must be dict")
+
+        primary_key = self.get_primary_key(table=table)
+        if primary_key not in record:
+            raise TypeError("'record' requires the primary key '{}'".format(primary_key))
+
+        return self._run(self.shard_index(record[primary_key]), "add_record",
+            table=table, record=record)
+
+    def add_records(self, table:str, records, chunk_size:int=1000):
+        """
+        Add many records to their shards.
+
+        records can be dicts or tuples with a value for every column. records are
+        grouped by shard and every shard adds its records in parallel. returns the
+        number of added records.
+        """
+        primary_key, columns = self._table_info(table)
+        key_index = columns.index(primary_key)
+
+        groups = {}
+        for record in records:
+            key = record[primary_key] if isinstance(record, dict) else record[key_index]
+            groups.setdefault(self.shard_index(key), []).append(record)
+
+        futures = [self._submit(index, "add_records", table=table, records=group,
+            chunk_size=chunk_size) for index, group in groups.items()]
+        return sum(future.result() for future in futures)
+
+    def get_record(self, table:str, primary_key, columns=None):
+        """Get row data / record from the shard of the primary key."""
+        return self._run(self.shard_index(primary_key), "get_record",
+            table=table, primary_key=primary_key, columns=columns)
+
+    def get_records(self, table:str, primary_keys, preserve_order:bool=False):
+        """
+        Get many records from their shards using a list of primary keys.
+
+        Returns a dictionary of records with the primary keys, like
+        ReallySimpleDB.get_records().
+        """
+        primary_keys = list(dict.fromkeys(primary_keys))
+        groups = self._group_by_shard(primary_keys)
+
+        records = {}
+        for result in self._run_all("get_records", args=lambda index: (table, groups[index]),
+                indexes=groups):
+            records.update(result)
+
+        if preserve_order:
+            records = {key: records[key] for key in primary_keys if key in records}
+
+        return records
+
+    def update_record(self, table:str, primary_key, changes:dict):
+        """Change the values of some columns of a record. the primary key cannot be changed."""
+        if self.get_primary_key(table=table) in changes:
+            raise ValueError("primary keys of sharded records cannot be changed")
+
+        return self._run(self.shard_index(primary_key), "update_record",
+            table=table, primary_key=primary_key, changes=changes)
+
+    def delete_record(self, table:str, primary_key):
+        """Delete record from the shard of the primary key."""
+        return self._run(self.shard_index(primary_key), "delete_record",
+            table=table, primary_key=primary_key)
+
+    def delete_records(self, table:str, primary_keys):
+        """Delete many records from their shards. returns the number of deleted records."""
+        groups = self._group_by_shard(primary_keys)
+        return sum(self._run_all("delete_records", args=lambda index: (table, groups[index]),
+            indexes=groups))
+
+    def delete_where(self, table:str, values:dict):
+        """Delete the records that match a filter from all the shards."""
+        return sum(self._run_all("delete_where", table=table, values=values))
+
+    def get_all_records(self, table:str, columns=None):
+        """Get all data / records of a table from all the shards, shard by shard."""
+        results = self._run_all("get_all_records", table=table, columns=columns)
+        return [record for result in results for record in result]
+
+    def filter_records(self,
+            table:str,
+            values:dict,
+            order_by="",
+            limit:int=None,
+            offset:int=None,
+            columns=None):
+        """
+        Get filtered record list from all the shards.
+
+        Same as ReallySimpleDB.filter_records(). every shard returns its first
+        limit + offset records and the merged records are ordered by order_by before
+        the limit and offset are used. order_by columns must be in columns.
+        """
+        shard_limit = None if limit is None else limit + (offset or 0)
+        results = self._run_all("filter_records", table=table, values=values,
+            order_by=order_by, limit=shard_limit, columns=columns)
+        records = [record for result in results for record in result]
+
+        if isinstance(order_by, str):
+            order_by = [order_by] if order_by else []
+
+        # stable sorts from the last column to the first one
+        for column in reversed(order_by):
+            descending = column.startswith("-")
+            records.sort(key=_sort_key(column[1:] if descending else column),
+                reverse=descending)
+
+        start = offset or 0
+        return records[start:None if limit is None else start + limit]
+
+    def count(self, table:str, where:dict=None):
+        """Get the number of records (that match a filter) in all the shards."""
+        return sum(self._run_all("count", table=table, where=where))
+
+    def exists(self, table:str, where:dict):
+        """Check if a shard has a record that matches a filter."""
+        return any(self._run_all("exists", table=table, where=where))
+
+    def close(self):
+        """Close the connections of all the shards and stop the shard threads."""
+        self._run_all("close_all_connections")
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+        return True
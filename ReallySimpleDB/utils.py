@@ -1,3 +1,20 @@
+import os
+import re
+import csv
+import json
+import time
+import sqlite3
+import threading
+
+from functools    import reduce
+from urllib.parse import quote
+from collections  import OrderedDict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 DATA_TYPES = {
     "INT" : type(int()),
     "INTEGER" : type(int()),
@@ -24,3 +41,415 @@ DATA_TYPES = {
     "DATE" : type(str()),
     "DATETIME" : type(str())
 }
+
+# array.array type codes of the python types. 8 bytes signed integers and doubles
+ARRAY_TYPES = {
+    type(int()) : "q",
+    type(float()) : "d"
+}
+
+# named PRAGMA settings for create_db / create_connection. cache_size values are
+# negative, so they are in KiB instead of pages
+PRAGMA_PROFILES = {
+    "durable" : {
+        "journal_mode" : "WAL",
+        "synchronous" : "FULL"
+    },
+    "fast" : {
+        "journal_mode" : "WAL",
+        "synchronous" : "NORMAL",
+        "cache_size" : -65536,
+        "mmap_size" : 268435456,
+        "temp_store" : "MEMORY"
+    },
+    "bulk_load" : {
+        "journal_mode" : "MEMORY",
+        "synchronous" : "OFF",
+        "cache_size" : -262144,
+        "temp_store" : "MEMORY"
+    },
+    "read_only_analytics" : {
+        "query_only" : "ON",
+        "cache_size" : -262144,
+        "mmap_size" : 1073741824,
+        "temp_store" : "MEMORY"
+    }
+}
+
+# file formats of import_file / export_file by the file extension
+FILE_FORMATS = {
+    ".csv" : "csv",
+    ".jsonl" : "jsonl",
+    ".ndjson" : "jsonl"
+}
+
+# data types used for new tables of import_file. later types can hold the values
+# of the earlier ones
+INFERRED_TYPES = ("INT", "REAL", "TEXT")
+
+# types of the records returned by the get / filter methods
+ROW_FORMATS = ("dict", "tuple", "namedtuple", "row")
+
+FILTER_OPERATORS = {
+    "eq" : "=",
+    "ne" : "!=",
+    "lt" : "<",
+    "le" : "<=",
+    "gt" : ">",
+    "ge" : ">=",
+    "between" : "BETWEEN",
+    "in" : "IN",
+    "like" : "LIKE",
+    "is_null" : "IS NULL"
+}
+
+# functions of aggregate(). total is the same as sum, but returns 0.0 instead of
+# NULL when there are no values
+AGGREGATE_FUNCTIONS = {
+    "count" : "COUNT",
+    "sum" : "SUM",
+    "total" : "TOTAL",
+    "min" : "MIN",
+    "max" : "MAX",
+    "avg" : "AVG"
+}
+
+# old style string filters like " <= 100", "!= 'A'"
+_STRING_FILTER = re.compile(r"^\s*(!=|>=|<=|>|<|=)\s*(.*?)\s*$", re.DOTALL)
+_STRING_OPERATORS = {"=": "eq", "!=": "ne", "<": "lt", "<=": "le", ">": "gt", ">=": "ge"}
+
+def _parse_literal(value:str):
+    """Convert the value of a string filter to str, int or float."""
+    if len(value) > 1 and value[0] == value[-1] and value[0] in ("'", '"'):
+        return value[1:-1]
+
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+
+    return value
+
+def _condition_shape(column:str, operator:str, value, params:list):
+    """Get the shape of one condition and append its values to params."""
+    if operator not in FILTER_OPERATORS:
+        raise ValueError("filter operator not supported, '{}'".format(operator))
+
+    if operator in ("eq", "ne") and value is None:
+        # column=NULL is never true. so it is converted to IS (NOT) NULL
+        return (column, "is_null", operator == "eq")
+
+    if operator == "is_null":
+        return (column, operator, bool(value))
+
+    if operator == "between":
+        low, high = value
+        params.extend((low, high))
+        return (column, operator)
+
+    if operator == "in":
+        value = list(value)
+        params.extend(value)
+        return (column, operator, len(value))
+
+    params.append(value)
+    return (column, operator)
+
+def filter_shape(values:dict, params:list):
+    """
+    Get the shape of a filter and append its values to params.
+
+    Shape is the filter without values. so filters with same columns and operators
+    have the same shape and the same SQL command. values can be:
+
+    - {"mark": 10} or {"mark": " <= 10"} (old style string filters)
+    - {"mark": {"ge": 10, "lt": 20}, "name": {"in": ["ABC", "DEF"]}}
+    - {"or": [{"mark": {"lt": 10}}, {"year": "2022"}]}
+    """
+    shape = []
+    for column in values:
+        value = values[column]
+
+        if column == "or":
+            # an empty OR group has no true condition and is not valid SQL
+            if not value:
+                raise ValueError("'or' must not be empty")
+            shape.append(("or", tuple(filter_shape(group, params) for group in value)))
+        elif isinstance(value, dict):
+            for operator in value:
+                shape.append(_condition_shape(column, operator, value[operator], params))
+        elif isinstance(value, str) and _STRING_FILTER.match(value):
+            operator, literal = _STRING_FILTER.match(value).groups()
+            shape.append(_condition_shape(
+                column, _STRING_OPERATORS[operator], _parse_literal(literal), params))
+        else:
+            shape.append(_condition_shape(column, "eq", value, params))
+
+    return tuple(shape)
+
+def filter_sql(shape:tuple, columns):
+    """Create the SQL condition of a filter shape. column names are checked with columns."""
+    conditions = []
+    for condition in shape:
+        if condition[0] == "or":
+            groups = [filter_sql(group, columns) for group in condition[1]]
+            conditions.append("(" + " OR ".join("(" + group + ")" for group in groups) + ")")
+            continue
+
+        column, operator = condition[0], condition[1]
+        if column not in columns:
+            raise sqlite3.OperationalError("no such column: {}".format(column))
+
+        if operator == "is_null":
+            conditions.append(column + (" IS NULL" if condition[2] else " IS NOT NULL"))
+        elif operator == "between":
+            conditions.append(column + " BETWEEN ? AND ?")
+        elif operator == "in":
+            conditions.append(column + " IN (" + ",".join("?" * condition[2]) + ")")
+        else:
+            conditions.append(column + " " + FILTER_OPERATORS[operator] + " ?")
+
+    # empty filter matches all the records
+    return " AND ".join(conditions) if conditions else "1"
+
+def order_by_sql(order_by, columns):
+    """
+    Create the ORDER BY list. order_by can be a column name or a list of column names.
+
+    Column names starting with '-' are sorted in descending order.
+    """
+    if isinstance(order_by, str):
+        order_by = [order_by]
+
+    terms = []
+    for column in order_by:
+        descending = column.startswith("-")
+        column = column[1:] if descending else column
+        if column not in columns:
+            raise sqlite3.OperationalError("no such column: {}".format(column))
+        terms.append(column + (" DESC" if descending else ""))
+
+    return ", ".join(terms)
+
+class RecordCache:
+    """
+    Size bounded LRU cache of records with an optional time to live.
+
+    Keys are (connection, table, primary key) tuples. hits, misses and evictions are
+    counted for tuning the cache size.
+    """
+
+    MISSING = object()
+
+    def __init__(self, size:int=1024, ttl:float=None) -> None:
+        """Create a cache with the maximum number of records and the time to live in seconds."""
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a record from the cache. returns RecordCache.MISSING if it is not cached."""
+        with self._lock:
+            cached = self._records.get(key)
+
+            if cached is None or (self.ttl is not None and time.monotonic() > cached[1]):
+                self.misses += 1
+                return self.MISSING
+
+            self._records.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+
+    def put(self, key, record):
+        """Add a record to the cache and remove the least recently used records."""
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+
+        with self._lock:
+            self._records[key] = (record, expires)
+            self._records.move_to_end(key)
+
+            while len(self._records) > self.size:
+                self._records.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Remove a record from the cache."""
+        with self._lock:
+            self._records.pop(key, None)
+
+    def invalidate_all(self, connection, table:str=""):
+        """Remove all the records of a connection, or of a table in a connection."""
+        with self._lock:
+            for key in list(self._records):
+                if key[0] is connection and table in ("", key[1]):
+                    del self._records[key]
+
+    def stats(self):
+        """Get the hits, misses, evictions and size of the cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self._records)}
+
+def profile_pragmas(profile:str="", pragmas:dict=None):
+    """
+    Get the PRAGMA settings of a profile and the given pragmas.
+
+    Given pragmas replace the settings of the profile. page_size is always first,
+    because it cannot be changed after the journal mode is set to WAL.
+    """
+    if profile and profile not in PRAGMA_PROFILES:
+        raise ValueError("pragma profile not supported, '{}'".format(profile))
+
+    settings = dict(PRAGMA_PROFILES[profile]) if profile else {}
+    settings.update(pragmas or {})
+
+    for name in settings:
+        value = settings[name]
+        if not name.isidentifier() \
+            or not (isinstance(value, int) or (isinstance(value, str) and value.isidentifier())):
+            raise ValueError("pragma not supported, '{}={}'".format(name, value))
+
+    return dict(sorted(settings.items(), key=lambda item: item[0] != "page_size"))
+
+def file_format(path:str, format_name:str=""):
+    """Get the format of a file from format_name, or from the file extension."""
+    if not format_name:
+        format_name = FILE_FORMATS.get(os.path.splitext(path)[1].lower(), "")
+
+    if format_name not in FILE_FORMATS.values():
+        raise ValueError("file format not supported, '{}'".format(format_name or path))
+
+    return format_name
+
+def read_file(path:str, format_name:str):
+    """
+    Read the records of a CSV or JSON Lines file one by one, using a generator.
+
+    Records are dictionaries. CSV values are strings and the first line of the
+    file must be the header. empty lines of JSON Lines files are skipped.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if format_name == "csv":
+            yield from csv.DictReader(file)
+            return
+
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+def _value_rank(value, parse_strings:bool):
+    """Get the index of the smallest INFERRED_TYPES type of a value."""
+    if parse_strings and isinstance(value, str):
+        for rank, convert in enumerate((int, float)):
+            try:
+                convert(value)
+                return rank
+            except ValueError:
+                pass
+        return 2
+
+    if isinstance(value, int):
+        return 0
+    if isinstance(value, float):
+        return 1
+    return 2
+
+def infer_datatype(values, parse_strings:bool=False):
+    """
+    Get the data type of a column from sample values.
+
+    Returns INT, REAL or TEXT. None and empty values are skipped. if parse_strings is
+    True (CSV files), strings that are numbers are INT / REAL values.
+    """
+    ranks = [_value_rank(value, parse_strings) for value in values
+        if value is not None and value != ""]
+
+    # columns without values are TEXT
+    return INFERRED_TYPES[max(ranks)] if ranks else "TEXT"
+
+def coerce_value(field:str, value, python_type):
+    """
+    Convert a value of a file to the python type of its column.
+
+    None and empty strings are NULL. raises TypeError if the value cannot be
+    converted.
+    """
+    if value is None or value == "":
+        return None
+
+    if python_type is None:
+        raise TypeError("datatype not supported, '{}'".format(field))
+
+    if type(value) is python_type:
+        return value
+
+    # JSON true / false are INT columns (like BOOLEAN)
+    if type(value) is bool and python_type in (int, float):
+        return python_type(value)
+
+    if isinstance(value, str) or (python_type is float and type(value) is int) \
+        or (python_type is str and type(value) in (int, float)):
+        try:
+            return python_type(value)
+        except ValueError:
+            pass
+
+    raise TypeError("The '{}' field requires '{}' but got '{}'"
+        .format(field, python_type, type(value)))
+
+def affinity_value(value, python_type):
+    """
+    Convert a value to the python type of its column, like sqlite type affinity.
+
+    sqlite converts '1' to 1 before it is compared with an INT column, so both
+    values find the same record. values that are not converted by sqlite are
+    returned as they are.
+    """
+    if python_type is int and isinstance(value, str):
+        for convert in (int, float):
+            try:
+                return convert(value)
+            except ValueError:
+                pass
+    elif python_type is float and isinstance(value, (str, int)) and type(value) is not bool:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    elif python_type is str and type(value) in (int, float):
+        return str(value)
+
+    return value
+
+def scan_partition(path:str, sql:str, params:list, columns:list, map_function=None,
+        reduce_function=None):
+    """
+    Read the records of one partition of a parallel scan in a worker process.
+
+    The database file is opened read-only. records are dictionaries. if map_function
+    is defined, it is called with every record. if reduce_function is defined,
+    returns (True, reduced value), or (False, None) if there are no records. else,
+    returns the list of (mapped) records.
+    """
+    connection = sqlite3.connect("file:" + quote(path) + "?mode=ro", uri=True)
+    try:
+        records = (dict(zip(columns, row)) for row in connection.execute(sql, params))
+        if map_function is not None:
+            records = map(map_function, records)
+
+        if reduce_function is None:
+            return list(records)
+
+        empty = object()
+        first = next(records, empty)
+        if first is empty:
+            return False, None
+
+        return True, reduce(reduce_function, records, first)
+    finally:
+        connection.close()
@@ -0,0 +1,136 @@
+import time
+import queue
+import threading
+
+from concurrent.futures import Future
+
+class Writer:
+    """
+    Writer class.
+
+    Writer objects own one thread that runs all the write operations of a database
+    one by one. operations are sent with submit() and their results are returned
+    using futures. with group commit, operations sent with submit_grouped() are
+    collected into one transaction.
+    """
+
+    # _run_group has not read the next item of the queue
+    _NEXT = object()
+
+    def __init__(self, name:str="ReallySimpleDB-writer") -> None:
+        """Create a object and start the writer thread."""
+        self._queue = queue.Queue()
+        self._group = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def group_commit(self):
+        """Check if group commit is enabled."""
+        return self._group is not None
+
+    def enable_group_commit(self, transaction, max_rows:int=500, max_delay:float=0.005):
+        """
+        Collect the grouped operations into transactions.
+
+        transaction is a function that returns a context manager of a transaction
+        (or a savepoint, when it is nested). a transaction is committed after
+        max_rows operations, or max_delay seconds after its first operation.
+        """
+        self._group = {"transaction": transaction, "max_rows": max_rows,
+            "max_delay": max_delay}
+
+    def disable_group_commit(self):
+        """Run the grouped operations one by one again."""
+        self._group = None
+
+    def is_writer_thread(self):
+        """Check if the current thread is the writer thread."""
+        return threading.current_thread() is self._thread
+
+    def submit(self, function, *args, **kwargs):
+        """Add an operation to the queue. returns a future of the result."""
+        future = Future()
+        self._queue.put((future, function, args, kwargs, False))
+        return future
+
+    def submit_grouped(self, function, *args, **kwargs):
+        """
+        Add an operation that can share a transaction with other operations.
+
+        Returns a future that gets the result after the transaction is committed.
+        """
+        future = Future()
+        self._queue.put((future, function, args, kwargs, True))
+        return future
+
+    def _run(self):
+        """Run the operations in the queue until stop() is called."""
+        item = self._queue.get()
+        while item is not None:
+            if item[4] and self._group is not None:
+                item = self._run_group(item, self._group)
+                continue
+
+            future, function, args, kwargs = item[:4]
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args, **kwargs))
+                except BaseException as error:
+                    future.set_exception(error)
+
+            item = self._queue.get()
+
+    def _run_group(self, item, group:dict):
+        """
+        Run grouped operations in one transaction and commit it.
+
+        Every operation has its own savepoint, so a failed operation does not roll
+        back the others. futures get the results after the commit. returns the next
+        item of the queue that is not in the transaction.
+        """
+        deadline = time.monotonic() + group["max_delay"]
+        done = []
+        count = 0
+        try:
+            with group["transaction"]():
+                while item is not None and item[4]:
+                    future, function, args, kwargs = item[:4]
+                    item = self._NEXT
+                    if future.set_running_or_notify_cancel():
+                        try:
+                            with group["transaction"]():
+                                result = function(*args, **kwargs)
+                            done.append((future, result))
+                        except Exception as error:
+                            future.set_exception(error)
+
+                    count += 1
+                    timeout = deadline - time.monotonic()
+                    if count >= group["max_rows"] or timeout <= 0:
+                        break
+
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+        except BaseException as error:
+            # the transaction is rolled back. if it is not started, the first
+            # operation is not run
+            if item is not self._NEXT and item is not None and item[4] and not count:
+                if item[0].set_running_or_notify_cancel():
+                    item[0].set_exception(error)
+                item = self._NEXT
+            for future, _ in done:
+                future.set_exception(error)
+        else:
+            for future, result in done:
+                future.set_result(result)
+
+        # stop (None) and operations that are not grouped run after the commit
+        return self._queue.get() if item is self._NEXT else item
+
+    def stop(self):
+        """Run the remaining operations in the queue and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,197 @@
+"""
+Benchmarks of the ReallySimpleDB methods.
+
+Measures add_record, get_record, get_all_records, filter_records and delete_record
+with tables of different sizes, on a temporary file and in memory. results are
+written as JSON and can be compared with a baseline results file.
+
+    python benchmarks/bench_manager.py --sizes 1000 100000 --output results.json
+    python benchmarks/bench_manager.py --baseline baseline.json --threshold 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from ReallySimpleDB import dbmanager
+
+TABLE = "STUDENTS"
+
+def create_table(database, path:str, size:int):
+    """Create the benchmark table and add size records."""
+    if path == ":memory:":
+        database.create_connection(path)
+    else:
+        database.create_db(dbpath=path, replace=True)
+
+    database.clean()
+    database.add_columns(column_name="student_id", datatype="INT", primary_key=True)
+    database.add_columns(column_name="name", not_null=True)
+    database.add_columns(column_name="mark", datatype="INT")
+    database.add_columns(column_name="year")
+    database.create_table(table_name=TABLE)
+
+    start = time.perf_counter()
+    database.add_records(table=TABLE, records=((index, "N{}".format(index), index % 100, "2022")
+        for index in range(size)), chunk_size=10000)
+    return time.perf_counter() - start
+
+def percentile(latencies:list, percent:int):
+    """Get a percentile of a sorted latencies list (nearest rank)."""
+    index = max(0, -(-len(latencies) * percent // 100) - 1)
+    return latencies[index]
+
+def measure(function, arguments:list, memory_samples:int, memory_arguments:list=None):
+    """
+    Call the function with every argument and get the statistics.
+
+    Peak memory is measured separately with tracemalloc, using the first
+    memory_samples arguments, so tracing does not change the latencies.
+    memory_arguments are used instead of the arguments for functions that
+    cannot be called twice with the same argument (add / delete a key).
+    """
+    latencies = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    if memory_arguments is None:
+        memory_arguments = arguments
+    for argument in memory_arguments[:memory_samples]:
+        function(argument)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / total if total else None,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "peak_memory": peak_memory
+    }
+
+def run(backend:str, size:int, ops:int, scan_ops:int):
+    """Run all the benchmarks of one backend and table size."""
+    database = dbmanager()
+    directory = tempfile.mkdtemp()
+    path = ":memory:" if backend == "memory" else os.path.join(directory, "bench.db")
+
+    results = {"populate": {"seconds": create_table(database, path, size)}}
+    random.seed(size)
+    ops = max(1, min(ops, size))
+    keys = random.sample(range(size), ops)
+    new_keys = list(range(size, size + ops + ops))
+    memory_samples = min(ops, 100)
+
+    # memory of add_record / delete_record is measured with other new keys. they
+    # are added here and deleted by delete_record
+    results["add_record"] = measure(
+        lambda key: database.add_record(table=TABLE, record={
+            "student_id": key, "name": "N{}".format(key), "mark": key % 100, "year": "2022"}),
+        new_keys[:ops], memory_samples, new_keys[ops:])
+
+    results["get_record"] = measure(
+        lambda key: database.get_record(table=TABLE, primary_key=key), keys, ops)
+
+    results["get_all_records"] = measure(
+        lambda _: database.get_all_records(table=TABLE), list(range(scan_ops)), 1)
+
+    results["filter_records"] = measure(
+        lambda mark: database.filter_records(table=TABLE, values={"mark": mark}),
+        [index % 100 for index in range(scan_ops)], 1)
+
+    results["delete_record"] = measure(
+        lambda key: database.delete_record(table=TABLE, primary_key=key), keys,
+        memory_samples, new_keys[ops:])
+
+    database.close_all_connections()
+    if path != ":memory:":
+        os.remove(path)
+    os.rmdir(directory)
+    return results
+
+def compare(results:dict, baseline:dict, threshold:float):
+    """
+    Compare ops/sec of the results with the baseline.
+
+    Returns a list of regressions, where ops/sec is lower than the baseline by more
+    than threshold (0.2 = 20%).
+    """
+    regressions = []
+    for key, operations in results["results"].items():
+        for operation, stats in operations.items():
+            old_stats = baseline["results"].get(key, {}).get(operation, {})
+            if not stats.get("ops_per_sec") or not old_stats.get("ops_per_sec"):
+                continue
+
+            change = stats["ops_per_sec"] / old_stats["ops_per_sec"] - 1
+            if change < -threshold:
+                regressions.append({"benchmark": key, "operation": operation,
+                    "ops_per_sec": stats["ops_per_sec"],
+                    "baseline_ops_per_sec": old_stats["ops_per_sec"], "change": change})
+
+    return regressions
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description="ReallySimpleDB benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000],
+        help="table sizes (default: 1000 100000 1000000)")
+    parser.add_argument("--backends", nargs="+", default=["file", "memory"],
+        choices=["file", "memory"], help="database backends (default: file memory)")
+    parser.add_argument("--ops", type=int, default=1000,
+        help="number of add / get / delete record calls (default: 1000)")
+    parser.add_argument("--scan-ops", type=int, default=5,
+        help="number of get_all_records / filter_records calls (default: 5)")
+    parser.add_argument("--output", default="bench_results.json",
+        help="JSON results file (default: bench_results.json)")
+    parser.add_argument("--baseline", help="JSON results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+        help="allowed ops/sec regression against the baseline (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    results = {"python": platform.python_version(), "platform": platform.platform(),
+        "results": {}}
+    for backend in args.backends:
+        for size in args.sizes:
+            key = "{}-{}".format(backend, size)
+            print("running {}..".format(key), file=sys.stderr)
+            results["results"][key] = run(backend, size, args.ops, args.scan_ops)
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(results, output, indent=2)
+
+    for key, operations in results["results"].items():
+        for operation, stats in operations.items():
+            if "ops_per_sec" in stats:
+                print("{:14} {:16} {:12.1f} ops/s  p50 {:.6f}s  p99 {:.6f}s  {:>10} B".format(
+                    key, operation, stats["ops_per_sec"] or 0, stats["p50"], stats["p99"],
+                    stats["peak_memory"]))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+
+        for regression in regressions:
+            print("REGRESSION {benchmark} {operation}: {ops_per_sec:.1f} ops/s, baseline "
+                "{baseline_ops_per_sec:.1f} ops/s ({change:+.1%})".format(**regression))
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
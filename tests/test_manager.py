@@ -1,6 +1,12 @@
 import os
+import time
+import asyncio
+import sqlite3
+import operator
+import threading
+from array import array
 from sqlite3 import OperationalError
-from ReallySimpleDB import dbmanager
+from ReallySimpleDB import dbmanager, asyncdbmanager, shardeddbmanager
 
 _dbmanager = dbmanager()
 
@@ -71,6 +77,16 @@ def test_is_table_4():
     """Check if the given table is not in the database.. without define the db."""
     assert not _dbmanager.is_table(table_name="NON")
 
+def test_is_table_5():
+    """Check if a table created by another connection is found.. schema cache."""
+    assert not _dbmanager.is_table(table_name="OTHERS")
+    other = sqlite3.connect("test.db")
+    other.execute("CREATE TABLE OTHERS (other_id TEXT PRIMARY KEY)")
+    other.close()
+    assert _dbmanager.is_table(table_name="OTHERS")
+    _dbmanager.delete_table(table="OTHERS")
+    assert not _dbmanager.is_table(table_name="OTHERS")
+
 def test_delete_table_1():
     """Delete table if table exists."""
     try:
@@ -116,6 +132,11 @@ def test_get_primary_key_2():
     """Find and get primary key of a table."""
     assert _dbmanager.get_primary_key(table="TEACHERS") == "teacher_id"
 
+def test_get_columns_2():
+    """Get the column names list after adding a column.. schema cache."""
+    _dbmanager.add_columns(column_name="subject", database="test.db", table="TEACHERS")
+    assert _dbmanager.get_columns(table="TEACHERS") == ["teacher_id", "name", "number", "subject"]
+
 def test_add_record_1():
     """Add a new record to a table."""
     assert _dbmanager.add_record(table="STUDENTS", record={"student_id": "1010", "name":"ABC", "mark":10, "year":"2022"}) == True
@@ -162,6 +183,98 @@ def test_filter_record_4():
     """Get filtered record list from a table: Comparison."""
     assert _dbmanager.filter_records(table="STUDENTS", values={"mark":" != 100"}) == [{'student_id': '1010', 'name': 'ABC', 'mark': 10, 'year': '2022'}]
 
+def test_filter_record_5():
+    """Get filtered record list from a table: Operators."""
+    assert _dbmanager.filter_records(table="STUDENTS", values={"mark": {"gt": 10, "le": 100}}) == [{'student_id': '1011', 'name': 'DEF', 'mark': 100, 'year': '2022'}]
+    assert _dbmanager.filter_records(table="STUDENTS", values={"mark": {"between": (10, 50)}, "name": {"like": "A%"}}) == [{'student_id': '1010', 'name': 'ABC', 'mark': 10, 'year': '2022'}]
+    assert _dbmanager.filter_records(table="STUDENTS", values={"name": {"in": ["DEF", "XYZ"]}, "year": {"is_null": False}}) == [{'student_id': '1011', 'name': 'DEF', 'mark': 100, 'year': '2022'}]
+
+def test_filter_record_6():
+    """Get filtered record list from a table: OR groups, order and limit."""
+    records = _dbmanager.filter_records(table="STUDENTS", values={"or": [{"mark": 10}, {"name": "DEF"}]}, order_by="-mark")
+    assert [record["student_id"] for record in records] == ["1011", "1010"]
+    records = _dbmanager.filter_records(table="STUDENTS", values={}, order_by=["mark"], limit=1, offset=1)
+    assert [record["student_id"] for record in records] == ["1011"]
+    try:
+        _dbmanager.filter_records(table="STUDENTS", values={"or": []})
+        assert False
+    except ValueError:
+        assert True
+
+def test_filter_record_7():
+    """Get filtered record list from a table: values are bound parameters."""
+    assert _dbmanager.filter_records(table="STUDENTS", values={"name": "x' OR '1'='1"}) == []
+    try:
+        _dbmanager.filter_records(table="STUDENTS", values={"address": "ABC"})
+        assert False
+    except OperationalError:
+        assert True
+
+def test_filter_record_8():
+    """Reuse the compiled SQL command for filters with the same shape."""
+    _dbmanager._filter_cache.clear()
+    _dbmanager.filter_records(table="STUDENTS", values={"mark": {"ge": 10}})
+    _dbmanager.filter_records(table="STUDENTS", values={"mark": {"ge": 50}})
+    assert len(_dbmanager._filter_cache) == 1
+
+def test_create_index():
+    """Create a composite index on a table."""
+    assert _dbmanager.create_index(table="STUDENTS", columns=["year", "mark"]) == "idx_STUDENTS_year_mark"
+    assert {"name": "idx_STUDENTS_year_mark", "table": "STUDENTS", "columns": ["year", "mark"], "unique": False} \
+        in _dbmanager.list_indexes(table="STUDENTS")
+
+def test_drop_index():
+    """Delete an index from the database."""
+    assert _dbmanager.drop_index(index_name="idx_STUDENTS_year_mark")
+    assert "idx_STUDENTS_year_mark" not in [index["name"] for index in _dbmanager.list_indexes()]
+
+def test_index_advisor_1():
+    """Suggest an index for filters that scan the whole table."""
+    _dbmanager.enable_index_advisor()
+    _dbmanager.filter_records(table="STUDENTS", values={"mark": {"ge": 10}, "year": "2022"})
+    assert _dbmanager.suggest_indexes() == [{"table": "STUDENTS", "columns": ["year", "mark"], "uses": 1}]
+
+def test_index_advisor_2():
+    """Create an index automatically for filters that scan the whole table."""
+    _dbmanager.enable_index_advisor(auto_create=True, min_uses=2)
+    _dbmanager.filter_records(table="STUDENTS", values={"name": "ABC"})
+    assert "idx_STUDENTS_name" not in [index["name"] for index in _dbmanager.list_indexes()]
+    _dbmanager.filter_records(table="STUDENTS", values={"name": "DEF"})
+    assert "idx_STUDENTS_name" in [index["name"] for index in _dbmanager.list_indexes()]
+    assert _dbmanager.suggest_indexes() == []
+    _dbmanager.disable_index_advisor()
+    _dbmanager.drop_index(index_name="idx_STUDENTS_name")
+
+def test_index_advisor_3():
+    """Do not create indexes for filters that cannot use them, or indexes that exist."""
+    _dbmanager.enable_index_advisor(auto_create=True)
+    for _ in range(3):
+        assert _dbmanager.filter_records(table="STUDENTS", values={"name": {"like": "A%"}, "mark": {"ne": 1}})
+    _dbmanager.create_index(table="STUDENTS", columns=["year", "mark"])
+    for _ in range(3):
+        _dbmanager.filter_records(table="STUDENTS", values={"year": "2022"})
+    assert [index["name"] for index in _dbmanager.list_indexes(table="STUDENTS") if not index["name"].startswith("sqlite_")] == ["idx_STUDENTS_year_mark"]
+    _dbmanager.disable_index_advisor()
+    _dbmanager.drop_index(index_name="idx_STUDENTS_year_mark")
+
+def test_index_advisor_4():
+    """Create indexes with free names, and never fail a filter on advisor errors."""
+    _dbmanager.create_index(table="STUDENTS", columns="year", index_name="idx_STUDENTS_name")
+    _dbmanager.enable_index_advisor(auto_create=True)
+    assert _dbmanager.filter_records(table="STUDENTS", values={"name": "DEF"})
+    assert "idx_STUDENTS_name_2" in [index["name"] for index in _dbmanager.list_indexes(table="STUDENTS")]
+    _dbmanager.connection.execute("PRAGMA query_only=ON")
+    try:
+        assert _dbmanager.filter_records(table="STUDENTS", values={"mark": 100})
+        assert _dbmanager.filter_records(table="STUDENTS", values={"mark": 100})
+    finally:
+        _dbmanager.connection.execute("PRAGMA query_only=OFF")
+    suggestions = _dbmanager.suggest_indexes()
+    assert [suggestion["columns"] for suggestion in suggestions] == [["mark"]] and "error" in suggestions[0]
+    _dbmanager.disable_index_advisor()
+    _dbmanager.drop_index(index_name="idx_STUDENTS_name")
+    _dbmanager.drop_index(index_name="idx_STUDENTS_name_2")
+
 def test_delete_record_1():
     """Delete record from a table."""
     assert _dbmanager.delete_record(table="STUDENTS", primary_key="1010")
@@ -174,6 +287,623 @@ def test_delete_record_2():
     except OperationalError:
         assert True
 
+def test_add_records_1():
+    """Add many records to a table."""
+    _dbmanager.clean()
+    _dbmanager.add_columns(column_name="subject_id", datatype="INT", primary_key=True)
+    _dbmanager.add_columns(column_name="name", not_null=True)
+    _dbmanager.create_table(table_name="SUBJECTS")
+
+    records = ({"subject_id": index, "name": "S{}".format(index)} for index in range(10))
+    assert _dbmanager.add_records(table="SUBJECTS", records=records, chunk_size=3) == 10
+    assert _dbmanager.add_records(table="SUBJECTS", records=[(10, "S10"), (11, "S11")]) == 2
+    assert len(_dbmanager.get_all_records(table="SUBJECTS")) == 12
+
+def test_add_records_2():
+    """Add many records to a table with datatype errors."""
+    try:
+        _dbmanager.add_records(table="SUBJECTS", records=[(12, "S12"), ("13", "S13")])
+        assert False
+    except TypeError:
+        assert True
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=12) == {}
+
+def test_transaction_1():
+    """Commit many mutations once at the end of the block."""
+    with _dbmanager.transaction():
+        _dbmanager.add_record(table="SUBJECTS", record={"subject_id": 20, "name": "S20"})
+        _dbmanager.delete_record(table="SUBJECTS", primary_key=0)
+        assert _dbmanager.connection.in_transaction
+    assert not _dbmanager.connection.in_transaction
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=20) == {"subject_id": 20, "name": "S20"}
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=0) == {}
+
+def test_transaction_2():
+    """Roll back the block and the nested savepoint on errors."""
+    try:
+        with _dbmanager.batch():
+            _dbmanager.add_record(table="SUBJECTS", record={"subject_id": 21, "name": "S21"})
+            try:
+                with _dbmanager.transaction():
+                    _dbmanager.add_record(table="SUBJECTS", record={"subject_id": 22, "name": "S22"})
+                    _dbmanager.add_record(table="SUBJECTS", record={"subject_id": 22, "name": "S22"})
+            except sqlite3.IntegrityError:
+                pass
+            assert _dbmanager.get_record(table="SUBJECTS", primary_key=21) != {}
+            assert _dbmanager.get_record(table="SUBJECTS", primary_key=22) == {}
+            raise ValueError
+    except ValueError:
+        pass
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=21) == {}
+
+def test_iter_records_1():
+    """Get all records of a table one by one using keyset pagination."""
+    records = _dbmanager.iter_records(table="SUBJECTS", batch_size=4)
+    assert not isinstance(records, list)
+    assert [record["subject_id"] for record in records] == list(range(1, 12)) + [20]
+
+def test_iter_records_2():
+    """Get all records of a table one by one ordered by a column."""
+    records = list(_dbmanager.iter_records(table="SUBJECTS", batch_size=5, order_by="name"))
+    names = [record["name"] for record in records]
+    assert len(names) == 12 and names == sorted(names)
+
+def test_get_records_page():
+    """Get records of a table page by page."""
+    records, after = _dbmanager.get_records_page(table="SUBJECTS", limit=5)
+    assert [record["subject_id"] for record in records] == [1, 2, 3, 4, 5]
+    records, after = _dbmanager.get_records_page(table="SUBJECTS", after=after, limit=10)
+    assert [record["subject_id"] for record in records] == list(range(6, 12)) + [20]
+    assert _dbmanager.get_records_page(table="SUBJECTS", after=after) == ([], None)
+
+def test_iter_records_3():
+    """Get all records of a table with NULL primary keys using keyset pagination."""
+    _dbmanager.clean()
+    _dbmanager.add_columns(column_name="tag_id", datatype="INT", primary_key=True)
+    _dbmanager.add_columns(column_name="name")
+    _dbmanager.create_table(table_name="TAGS")
+    _dbmanager.connection.executemany("INSERT INTO TAGS VALUES (?, ?)", [(None, "A"), (None, "B"), (1, "C"), (None, "D")])
+    _dbmanager.connection.commit()
+    assert [record["name"] for record in _dbmanager.iter_records(table="TAGS", batch_size=2)] == ["A", "B", "C", "D"]
+    records, after = _dbmanager.get_records_page(table="TAGS", limit=2)
+    assert after is not None and len(_dbmanager.get_records_page(table="TAGS", after=after, limit=5)[0]) == 2
+    _dbmanager.delete_table(table="TAGS")
+
+def test_get_records_1():
+    """Get many records from a table using a list of primary keys."""
+    records = _dbmanager.get_records(table="SUBJECTS", primary_keys=[5, 3, 3, 100], preserve_order=True)
+    assert records == {5: {"subject_id": 5, "name": "S5"}, 3: {"subject_id": 3, "name": "S3"}}
+    assert list(records) == [5, 3]
+
+def test_get_records_2():
+    """Get many records from a table and the missing primary keys."""
+    keys = list(range(-1000, 1000))
+    records, missing = _dbmanager.get_records(table="SUBJECTS", primary_keys=keys, report_missing=True)
+    assert sorted(records) == list(range(1, 12)) + [20]
+    assert len(missing) == len(keys) - 12 and missing[0] == -1000
+    records, missing = _dbmanager.get_records(table="SUBJECTS", primary_keys=["5", 6, 5, "x"], preserve_order=True, report_missing=True)
+    assert list(records) == [5, 6] and missing == ["x"]
+
+def test_update_record():
+    """Change some columns of a record."""
+    assert _dbmanager.update_record(table="SUBJECTS", primary_key=5, changes={"name": "U5"})
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=5) == {"subject_id": 5, "name": "U5"}
+    assert not _dbmanager.update_record(table="SUBJECTS", primary_key=100, changes={"name": "U100"})
+    try:
+        _dbmanager.update_record(table="SUBJECTS", primary_key=5, changes={"name": 5})
+        assert False
+    except TypeError:
+        assert True
+
+def test_schema_version():
+    """Check 'PRAGMA schema_version' once per record operation.. schema cache."""
+    statements = []
+    _dbmanager.connection.set_trace_callback(statements.append)
+    try:
+        assert _dbmanager.add_record(table="SUBJECTS", record={"subject_id": 60, "name": "S60"})
+        assert _dbmanager.get_record(table="SUBJECTS", primary_key=60, columns=["name"]) == {"name": "S60"}
+        assert _dbmanager.update_record(table="SUBJECTS", primary_key=60, changes={"name": "U60"})
+    finally:
+        _dbmanager.connection.set_trace_callback(None)
+    assert [sql for sql in statements if "schema_version" in sql] == ["PRAGMA schema_version;"] * 3
+    _dbmanager.delete_record(table="SUBJECTS", primary_key=60)
+
+def test_upsert_records():
+    """Add new records and replace existing records."""
+    assert _dbmanager.upsert_records(table="SUBJECTS", records=[(5, "S5"), {"subject_id": 50, "name": "S50"}]) == 2
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=5) == {"subject_id": 5, "name": "S5"}
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=50) == {"subject_id": 50, "name": "S50"}
+    _dbmanager.delete_record(table="SUBJECTS", primary_key=50)
+    _dbmanager.add_record(table="STUDENTS", record={"student_id": "1050", "name": "UVW", "mark": 5, "year": "2022"})
+    assert _dbmanager.upsert_records(table="STUDENTS", records=[{"student_id": "1050", "mark": 6}, ("1051", "XYZ", 7, "2023")]) == 2
+    assert _dbmanager.get_record(table="STUDENTS", primary_key="1050") == {"student_id": "1050", "name": "UVW", "mark": 6, "year": "2022"}
+    assert _dbmanager.get_record(table="STUDENTS", primary_key="1051") == {"student_id": "1051", "name": "XYZ", "mark": 7, "year": "2023"}
+    assert _dbmanager.delete_records(table="STUDENTS", primary_keys=["1050", "1051"]) == 2
+
+def test_delete_records():
+    """Delete many records using a list of primary keys and a filter."""
+    _dbmanager.add_records(table="SUBJECTS", records=[(index, "D{}".format(index)) for index in range(100, 1200)])
+    assert _dbmanager.delete_records(table="SUBJECTS", primary_keys=list(range(100, 1100)) + [100, 5000]) == 1000
+    assert _dbmanager.delete_where(table="SUBJECTS", values={"name": {"like": "D%"}, "subject_id": {"ge": 1150}}) == 50
+    assert _dbmanager.delete_where(table="SUBJECTS", values={"subject_id": {"ge": 100}}) == 50
+    assert len(_dbmanager.get_all_records(table="SUBJECTS")) == 12
+    try:
+        _dbmanager.delete_where(table="SUBJECTS", values={})
+        assert False
+    except ValueError:
+        assert True
+
+def test_count_exists():
+    """Count records and check if a record exists inside sqlite."""
+    assert _dbmanager.count(table="SUBJECTS") == 12
+    assert _dbmanager.count(table="SUBJECTS", where={"subject_id": {"lt": 4}}) == 3
+    assert _dbmanager.exists(table="SUBJECTS", where={"name": "S20"})
+    assert not _dbmanager.exists(table="SUBJECTS", where={"name": "S21"})
+
+def test_aggregate():
+    """Calculate aggregates inside sqlite, with and without groups."""
+    assert _dbmanager.aggregate(table="SUBJECTS", functions={"subject_id": ["min", "max", "sum"], "*": "count"}) == \
+        {"min(subject_id)": 1, "max(subject_id)": 20, "sum(subject_id)": 86, "count(*)": 12}
+    assert _dbmanager.aggregate(table="SUBJECTS", functions={"subject_id": "avg"}, group_by="name", where={"subject_id": {"lt": 3}}) == \
+        [{"name": "S1", "avg(subject_id)": 1.0}, {"name": "S2", "avg(subject_id)": 2.0}]
+    try:
+        _dbmanager.aggregate(table="SUBJECTS", functions={"subject_id": "median"})
+        assert False
+    except ValueError:
+        assert True
+
+def test_columns_projection():
+    """Read only the selected columns of the records."""
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=2, columns=["name"]) == {"name": "S2"}
+    assert _dbmanager.get_all_records(table="SUBJECTS", columns="subject_id")[-1] == {"subject_id": 20}
+    assert _dbmanager.filter_records(table="SUBJECTS", values={"subject_id": {"lt": 3}}, columns=["name"]) == [{"name": "S1"}, {"name": "S2"}]
+    try:
+        _dbmanager.get_all_records(table="SUBJECTS", columns=["subject_id", "mark"])
+        assert False
+    except OperationalError:
+        assert True
+
+def subject_id(record):
+    """Get the subject_id of a record in parallel scan workers."""
+    return record["subject_id"]
+
+def test_parallel_scan():
+    """Filter, map and reduce the records of a table in worker processes."""
+    records = _dbmanager.parallel_scan(table="SUBJECTS", values={"subject_id": {"ge": 3}}, processes=2, partitions=5)
+    assert [record["subject_id"] for record in records] == list(range(3, 12)) + [20]
+    assert _dbmanager.parallel_scan(table="SUBJECTS", map_function=subject_id, reduce_function=operator.add, processes=2) == 86
+    assert _dbmanager.parallel_scan(table="SUBJECTS", values={"name": "S21"}, map_function=subject_id, reduce_function=operator.add) is None
+
+def test_record_cache_1():
+    """Cache the records read by get_record and remove them on writes."""
+    _dbmanager.enable_record_cache(size=2)
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=30) == {}
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=30) == {}
+    _dbmanager.add_record(table="SUBJECTS", record={"subject_id": 30, "name": "S30"})
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=30) == {"subject_id": 30, "name": "S30"}
+    _dbmanager.get_record(table="SUBJECTS", primary_key=1)
+    _dbmanager.get_record(table="SUBJECTS", primary_key=2)
+    _dbmanager.delete_record(table="SUBJECTS", primary_key=30)
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=30) == {}
+    assert _dbmanager.record_cache_stats() == {"hits": 1, "misses": 5, "evictions": 2, "size": 2}
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=31) == {}
+    try:
+        _dbmanager.add_records(table="SUBJECTS", records=[(31, "S31"), (32, "S32"), ("33", "S33")], chunk_size=2)
+        assert False
+    except TypeError:
+        assert True
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=31) == {"subject_id": 31, "name": "S31"}
+    assert _dbmanager.delete_records(table="SUBJECTS", primary_keys=[31, 32]) == 2
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key="2") == {"subject_id": 2, "name": "S2"}
+    _dbmanager.update_record(table="SUBJECTS", primary_key=2, changes={"name": "U2"})
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key="2") == {"subject_id": 2, "name": "U2"}
+    _dbmanager.update_record(table="SUBJECTS", primary_key="2", changes={"name": "S2"})
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=2) == {"subject_id": 2, "name": "S2"}
+
+def test_record_cache_2():
+    """Remove the cached records when another connection writes to the database."""
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=1) == {"subject_id": 1, "name": "S1"}
+    other = sqlite3.connect("test.db")
+    other.execute("UPDATE SUBJECTS SET name='X1' WHERE subject_id=1")
+    other.commit()
+    other.close()
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=1) == {"subject_id": 1, "name": "X1"}
+    _dbmanager.disable_record_cache()
+
+def test_get_columns_data_1():
+    """Get the values of columns as arrays."""
+    data = _dbmanager.get_columns_data(table="SUBJECTS", columns=["subject_id", "name"], where={"subject_id": {"lt": 4}}, as_numpy=False)
+    assert data["subject_id"] == array("q", [1, 2, 3])
+    assert data["name"] == ["X1", "S2", "S3"]
+
+def test_get_columns_data_2():
+    """Get the values of a column with NULL values as an array."""
+    _dbmanager.add_columns(column_name="credits", datatype="REAL", database="test.db", table="SUBJECTS")
+    credits = _dbmanager.get_columns_data(table="SUBJECTS", columns="credits", as_numpy=False)["credits"]
+    assert credits.typecode == "d" and len(credits) == _dbmanager.count(table="SUBJECTS")
+    assert all(value != value for value in credits)
+    assert set(_dbmanager.get_columns_data(table="SUBJECTS", columns="credits", as_numpy=False, null=0.0)["credits"]) == {0.0}
+    assert len(_dbmanager.get_columns_data(table="SUBJECTS", columns="credits", where={"credits": {"is_null": False}})["credits"]) == 0
+
+def test_get_columns_data_3():
+    """Get the values of an integer column with NULL values as an array."""
+    _dbmanager.clean()
+    _dbmanager.add_columns(column_name="score_id", datatype="INT", primary_key=True)
+    _dbmanager.add_columns(column_name="score", datatype="INT")
+    _dbmanager.create_table(table_name="SCORES")
+    _dbmanager.add_record(table="SCORES", record={"score_id": 1, "score": 5})
+    _dbmanager.connection.execute("INSERT INTO SCORES VALUES (2, NULL)")
+    _dbmanager.connection.commit()
+    try:
+        _dbmanager.get_columns_data(table="SCORES", columns="score")
+        assert False
+    except TypeError:
+        assert True
+    assert _dbmanager.get_columns_data(table="SCORES", columns="score", as_numpy=False, null=-1)["score"] == array("q", [5, -1])
+    _dbmanager.delete_table(table="SCORES")
+
+def test_export_file():
+    """Write the filtered records of a table to CSV and JSON Lines files."""
+    assert _dbmanager.export_file(table="SUBJECTS", path="subjects.csv", where={"subject_id": {"lt": 4}}) == 3
+    assert _dbmanager.export_file(table="SUBJECTS", path="subjects.jsonl") == 12
+    with open("subjects.csv") as file:
+        assert file.read().splitlines()[:2] == ["subject_id,name,credits", "1,X1,"]
+    with open("subjects.jsonl") as file:
+        assert file.readline() == '{"subject_id": 1, "name": "X1", "credits": null}\n'
+
+def test_import_file_1():
+    """Create a table from a CSV file with inferred types."""
+    assert _dbmanager.import_file(table="SUBJECTS_COPY", path="subjects.csv", create_table=True, primary_key="subject_id", chunk_size=2) == 3
+    assert _dbmanager.get_all_column_types(table="SUBJECTS_COPY") == {"subject_id": "INT", "name": "TEXT", "credits": "TEXT"}
+    assert _dbmanager.get_record(table="SUBJECTS_COPY", primary_key=2) == {"subject_id": 2, "name": "S2", "credits": None}
+
+def test_import_file_2():
+    """Add the records of a JSON Lines file with type conversions."""
+    with open("subjects.jsonl", "w") as file:
+        file.write('{"subject_id": "40", "name": 40}\n\n{"subject_id": 41, "name": "S41", "credits": 2.5}\n')
+    assert _dbmanager.import_file(table="SUBJECTS", path="subjects.jsonl") == 2
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=40) == {"subject_id": 40, "name": "40", "credits": None}
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=41) == {"subject_id": 41, "name": "S41", "credits": 2.5}
+    with open("subjects.jsonl", "w") as file:
+        file.write('{"subject_id": "x42"}\n')
+    try:
+        _dbmanager.import_file(table="SUBJECTS", path="subjects.jsonl")
+        assert False
+    except TypeError:
+        assert True
+    with open("subjects.jsonl", "w") as file:
+        file.write('{"flag_id": 1, "flag": true}\n{"flag_id": 2, "flag": "x"}\n')
+    try:
+        _dbmanager.import_file(table="FLAGS", path="subjects.jsonl", create_table=True, sample_size=1)
+        assert False
+    except TypeError:
+        assert not _dbmanager.is_table(table_name="FLAGS")
+    with open("subjects.jsonl", "w") as file:
+        file.write('{"flag_id": 1, "flag": true}\n{"flag_id": 2, "flag": false}\n')
+    assert _dbmanager.import_file(table="FLAGS", path="subjects.jsonl", create_table=True, primary_key="flag_id") == 2
+    assert _dbmanager.get_record(table="FLAGS", primary_key=1) == {"flag_id": 1, "flag": 1}
+    _dbmanager.delete_table(table="FLAGS")
+    _dbmanager.delete_record(table="SUBJECTS", primary_key=40)
+    _dbmanager.delete_record(table="SUBJECTS", primary_key=41)
+    _dbmanager.delete_table(table="SUBJECTS_COPY")
+    os.remove("subjects.csv")
+    os.remove("subjects.jsonl")
+
+def test_row_format_1():
+    """Get records as tuples and namedtuples."""
+    _dbmanager.set_row_format("tuple")
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=2) == (2, "S2", None)
+    assert _dbmanager.get_record(table="SUBJECTS", primary_key=200) is None
+    _dbmanager.set_row_format("namedtuple")
+    records = _dbmanager.filter_records(table="SUBJECTS", values={"subject_id": {"in": [2, 3]}})
+    assert [record.name for record in records] == ["S2", "S3"]
+    assert type(records[0]) is type(_dbmanager.get_all_records(table="SUBJECTS")[0])
+
+def test_row_format_2():
+    """Get records as sqlite3.Row objects."""
+    _dbmanager.set_row_format("row")
+    records = list(_dbmanager.iter_records(table="SUBJECTS", batch_size=5))
+    assert isinstance(records[0], sqlite3.Row) and records[1]["name"] == "S2"
+    assert _dbmanager.get_records(table="SUBJECTS", primary_keys=[3])[3]["name"] == "S3"
+    _dbmanager.set_row_format("dict")
+    try:
+        _dbmanager.set_row_format("list")
+        assert False
+    except ValueError:
+        assert True
+
+def test_instrumentation_1():
+    """Record the calls of the methods and the SQL commands."""
+    events = []
+    _dbmanager.enable_instrumentation(slow_query_threshold=0, callback=events.append, trace=True)
+    _dbmanager.get_record(table="SUBJECTS", primary_key=2)
+    _dbmanager.filter_records(table="SUBJECTS", values={"subject_id": {"lt": 4}})
+    stats = _dbmanager.instrumentation_stats()
+    assert stats[("method", "get_record")]["count"] == 1
+    assert stats[("method", "get_record")]["rows"] == 1
+    assert stats[("method", "filter_records")]["rows"] == 3
+    assert stats[("sql", "SELECT * FROM SUBJECTS WHERE subject_id=?;")]["count"] == 1
+    assert {"count", "total", "mean", "p50", "p95", "p99", "rows"} == set(stats[("method", "get_record")])
+    assert any(event["kind"] == "trace" for event in events)
+    assert len(_dbmanager.slow_queries()) == len(events) - len([event for event in events if event["kind"] == "trace"])
+    filter_sql = [key for key in stats if key[0] == "sql" and "subject_id < ?" in key[1]][0]
+    assert stats[("sql", "SELECT * FROM SUBJECTS WHERE subject_id=?;")]["rows"] == 1
+    assert stats[filter_sql]["rows"] == 3
+    records = _dbmanager.iter_records(table="SUBJECTS", batch_size=5)
+    assert ("method", "iter_records") not in _dbmanager.instrumentation_stats()
+    assert len(list(records)) == _dbmanager.instrumentation_stats()[("method", "iter_records")]["rows"] == 12
+
+def test_instrumentation_2():
+    """Stop recording the calls."""
+    assert _dbmanager.disable_instrumentation()
+    _dbmanager.get_record(table="SUBJECTS", primary_key=2)
+    try:
+        _dbmanager.instrumentation_stats()
+        assert False
+    except NotImplementedError:
+        assert True
+
+def test_create_connection_1():
+    """Reuse the pooled connection of a database."""
+    connection = _dbmanager.connection
+    _dbmanager.create_connection("test.db")
+    _dbmanager.create_connection(os.path.realpath("test.db"))
+    assert _dbmanager.connection is connection
+
+def test_create_connection_2():
+    """Keep the connection pool size under max_connections."""
+    pooled = dbmanager(max_connections=2)
+    for index in range(4):
+        pooled.create_db(dbpath="pool{}.db".format(index), replace=True)
+    assert len(pooled._connections) == 2
+    pooled.close_all_connections()
+    for index in range(4):
+        os.remove("pool{}.db".format(index))
+
+def test_pragma_profile_1():
+    """Create a database with a PRAGMA profile."""
+    profiled = dbmanager(pragmas={"cache_size": -4096})
+    profiled.create_db(dbpath="profile.db", replace=True, profile="fast", pragmas={"page_size": 8192})
+    assert profiled.connection.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+    assert profiled.connection.execute("PRAGMA synchronous;").fetchone()[0] == 1
+    assert profiled.connection.execute("PRAGMA page_size;").fetchone()[0] == 8192
+    assert profiled.connection.execute("PRAGMA cache_size;").fetchone()[0] == -65536
+    profiled.close_all_connections()
+    profiled.create_connection("profile.db")
+    assert profiled.connection.execute("PRAGMA cache_size;").fetchone()[0] == -4096
+    profiled.close_all_connections()
+
+def test_pragma_profile_2():
+    """Use a PRAGMA profile inside a block and restore the old settings."""
+    profiled = dbmanager()
+    profiled.create_connection("profile.db")
+    with profiled.pragma_profile("bulk_load"):
+        assert profiled.connection.execute("PRAGMA synchronous;").fetchone()[0] == 0
+    assert profiled.connection.execute("PRAGMA synchronous;").fetchone()[0] == 2
+    try:
+        profiled.apply_pragmas(pragmas={"synchronous": "OFF; DROP TABLE X"})
+        assert False
+    except ValueError:
+        assert True
+    profiled.close_all_connections()
+    for path in ("profile.db", "profile.db-wal", "profile.db-shm"):
+        if os.path.isfile(path):
+            os.remove(path)
+
+def test_concurrent_mode_1():
+    """Share one object between threads with one writer thread."""
+    concurrent = dbmanager()
+    concurrent.create_db(dbpath="concurrent.db", replace=True)
+    concurrent.add_columns(column_name="item_id", datatype="INT", primary_key=True)
+    concurrent.add_columns(column_name="name")
+    concurrent.create_table(table_name="ITEMS")
+    assert concurrent.enable_concurrent_mode()
+    assert concurrent.connection.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+
+    def worker(start):
+        for index in range(start, start + 50):
+            concurrent.add_record(table="ITEMS", record={"item_id": index, "name": "I{}".format(index)})
+            assert concurrent.get_record(table="ITEMS", primary_key=index)["item_id"] == index
+
+    threads = [threading.Thread(target=worker, args=(start,)) for start in range(0, 200, 50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(concurrent.get_all_records(table="ITEMS")) == 200
+    concurrent.close_all_connections()
+
+def test_concurrent_mode_2():
+    """Run a transaction on the writer thread in concurrent mode."""
+    concurrent = dbmanager()
+    concurrent.enable_concurrent_mode(database="concurrent.db")
+    try:
+        with concurrent.transaction():
+            pass
+        assert False
+    except NotImplementedError:
+        assert True
+
+    def delete_items(database):
+        with database.transaction():
+            for index in range(100):
+                database.delete_record(table="ITEMS", primary_key=index)
+
+    concurrent.run_in_writer(delete_items, concurrent)
+    assert len(concurrent.get_all_records(table="ITEMS")) == 100
+
+    # connections of finished threads are closed
+    for _ in range(20):
+        thread = threading.Thread(target=concurrent.count, kwargs={"table": "ITEMS"})
+        thread.start()
+        thread.join()
+    assert len(concurrent._open_connections()) <= 3
+    assert concurrent.disable_concurrent_mode()
+    assert len(concurrent.get_all_records(table="ITEMS")) == 100
+    concurrent.close_all_connections()
+    for path in ("concurrent.db", "concurrent.db-wal", "concurrent.db-shm"):
+        if os.path.isfile(path):
+            os.remove(path)
+
+def test_group_commit():
+    """Commit the writes of many threads together and get the results with futures."""
+    grouped = dbmanager()
+    grouped.create_db(dbpath="group.db", replace=True)
+    grouped.add_columns(column_name="item_id", datatype="INT", primary_key=True)
+    grouped.create_table(table_name="ITEMS")
+    grouped.enable_instrumentation()
+    assert grouped.enable_group_commit(max_rows=40, max_delay=0.05)
+    futures = []
+
+    def worker(start):
+        for index in range(start, start + 25):
+            futures.append(grouped.add_record(table="ITEMS", record={"item_id": index}))
+
+    threads = [threading.Thread(target=worker, args=(start,)) for start in range(0, 100, 25)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    duplicate = grouped.add_record(table="ITEMS", record={"item_id": 0})
+    deleted = grouped.delete_record(table="ITEMS", primary_key=99)
+    assert all(future.result() for future in futures)
+    assert isinstance(duplicate.exception(), sqlite3.IntegrityError) and deleted.result()
+    assert grouped.count(table="ITEMS") == 99
+    assert grouped.instrumentation_stats("sql")[("sql", "COMMIT")]["count"] < 20
+    assert grouped.disable_group_commit()
+    assert grouped.add_record(table="ITEMS", record={"item_id": 99}) is True
+    grouped.close_all_connections()
+    for path in ("group.db", "group.db-wal", "group.db-shm"):
+        if os.path.isfile(path):
+            os.remove(path)
+
+def test_memory_mode_1():
+    """Load a database into memory and save it with checkpoints."""
+    memory = dbmanager()
+    memory.create_db(dbpath="memory.db", replace=True)
+    memory.add_columns(column_name="item_id", datatype="INT", primary_key=True)
+    memory.create_table(table_name="ITEMS")
+    memory.add_record(table="ITEMS", record={"item_id": 1})
+    assert memory.enable_memory_mode("memory.db", pages=1)
+    assert memory.connection.execute("PRAGMA database_list;").fetchone()[2] == ""
+    memory.add_record(table="ITEMS", record={"item_id": 2}, database="memory.db")
+    assert dbmanager().count(table="ITEMS", database="memory.db") == 1
+    assert memory.checkpoint()
+    assert dbmanager().count(table="ITEMS", database="memory.db") == 2
+    memory.add_record(table="ITEMS", record={"item_id": 3})
+    memory.close_connection()
+    assert dbmanager().count(table="ITEMS", database="memory.db") == 3
+
+def test_memory_mode_2():
+    """Save the in-memory database on an interval."""
+    memory = dbmanager()
+    memory.enable_memory_mode("memory.db", checkpoint_interval=0.01)
+    memory.add_record(table="ITEMS", record={"item_id": 4})
+    time.sleep(0.2)
+    assert dbmanager().count(table="ITEMS", database="memory.db") == 4
+    memory.add_record(table="ITEMS", record={"item_id": 5})
+    assert memory.disable_memory_mode(save=False)
+    assert memory.count(table="ITEMS") == 4
+    memory.close_all_connections()
+    os.remove("memory.db")
+
+def test_async_manager_1():
+    """Use the database from coroutines."""
+    async def main():
+        async with asyncdbmanager() as database:
+            await database.create_db(dbpath="async.db", replace=True)
+            await database.add_columns(column_name="item_id", datatype="INT", primary_key=True)
+            await database.add_columns(column_name="name")
+            await database.create_table(table_name="ITEMS")
+
+            async with database.transaction():
+                await database.add_records(table="ITEMS", records=[(index, "I{}".format(index)) for index in range(25)])
+
+            assert await database.get_record(table="ITEMS", primary_key=3) == {"item_id": 3, "name": "I3"}
+            assert await database.filter_records(table="ITEMS", values={"item_id": {"lt": 2}}) == \
+                [{"item_id": 0, "name": "I0"}, {"item_id": 1, "name": "I1"}]
+            return [record["item_id"] async for record in database.iter_records(table="ITEMS", batch_size=10)]
+
+    assert asyncio.run(main()) == list(range(25))
+
+def test_async_manager_2():
+    """Roll back a transaction from coroutines."""
+    async def main():
+        async with asyncdbmanager() as database:
+            try:
+                async with database.transaction(database="async.db"):
+                    await database.delete_record(table="ITEMS", primary_key=3)
+                    raise ValueError
+            except ValueError:
+                pass
+            return await database.get_record(table="ITEMS", primary_key=3)
+
+    assert asyncio.run(main()) == {"item_id": 3, "name": "I3"}
+    os.remove("async.db")
+
+def test_sharded_manager_1():
+    """Split the records of a table into many database files by the primary key."""
+    paths = ["shard{}.db".format(index) for index in range(3)]
+    with shardeddbmanager(paths) as sharded:
+        sharded.add_columns(column_name="item_id", datatype="INT", primary_key=True)
+        sharded.add_columns(column_name="name")
+        assert sharded.create_table(table_name="ITEMS")
+        assert sharded.add_records(table="ITEMS", records=[(index, "I{}".format(index)) for index in range(30)]) == 30
+        assert sharded.add_record(table="ITEMS", record={"item_id": 30, "name": "I30"})
+        assert sharded.get_record(table="ITEMS", primary_key=7) == {"item_id": 7, "name": "I7"}
+        counts = [dbmanager().count(table="ITEMS", database=path) for path in paths]
+        assert all(0 < count < 31 for count in counts)
+        assert sharded.count(table="ITEMS") == len(sharded.get_all_records(table="ITEMS")) == 31
+        assert sharded.filter_records(table="ITEMS", values={"item_id": {"lt": 20}}, order_by="-item_id", limit=3, offset=1) == \
+            [{"item_id": 18, "name": "I18"}, {"item_id": 17, "name": "I17"}, {"item_id": 16, "name": "I16"}]
+        assert sharded.add_columns(column_name="mark", datatype="INT", table="ITEMS")
+        assert sharded.update_record(table="ITEMS", primary_key=1, changes={"mark": 5})
+        assert sharded.update_record(table="ITEMS", primary_key=3, changes={"mark": 1})
+        assert [record["item_id"] for record in sharded.filter_records(table="ITEMS", values={"item_id": {"lt": 4}}, order_by=["mark", "-item_id"])] == [2, 0, 3, 1]
+        assert sharded.delete_records(table="ITEMS", primary_keys=range(10)) == 10
+        assert sharded.delete_record(table="ITEMS", primary_key=10)
+        assert sharded.count(table="ITEMS") == 20
+    for path in paths:
+        os.remove(path)
+
+def test_sharded_manager_2():
+    """Split the records by primary key ranges."""
+    paths = ["shard{}.db".format(index) for index in range(2)]
+    with shardeddbmanager(paths, strategy="range", boundaries=[100]) as sharded:
+        sharded.add_columns(column_name="item_id", datatype="INT", primary_key=True)
+        sharded.create_table(table_name="ITEMS")
+        sharded.add_records(table="ITEMS", records=[(50,), (150,), (250,)])
+        assert [dbmanager().count(table="ITEMS", database=path) for path in paths] == [1, 2]
+        calls = []
+        run = sharded._run
+        sharded._run = lambda index, name, *args, **kwargs: calls.append((index, name)) or run(index, name, *args, **kwargs)
+        sharded.add_record(table="ITEMS", record={"item_id": 350})
+        assert calls == [(1, "add_record")]
+        assert sharded.get_records(table="ITEMS", primary_keys=[250, 50, 1], preserve_order=True) == \
+            {250: {"item_id": 250}, 50: {"item_id": 50}}
+    for path in paths:
+        os.remove(path)
+
+def test_async_manager_3():
+    """Await group commit writes and run transactions in concurrent mode from coroutines."""
+    async def main():
+        async with asyncdbmanager() as database:
+            await database.create_db(dbpath="async.db", replace=True)
+            await database.add_columns(column_name="item_id", datatype="INT", primary_key=True)
+            await database.create_table(table_name="ITEMS")
+            await database.enable_group_commit(max_delay=0.01)
+            results = await asyncio.gather(*(database.add_record(table="ITEMS", record={"item_id": index}) for index in range(10)))
+            async with database.transaction():
+                await database.add_record(table="ITEMS", record={"item_id": 10})
+            return results, await database.count(table="ITEMS")
+
+    assert asyncio.run(main()) == ([True] * 10, 11)
+    for path in ("async.db", "async.db-wal", "async.db-shm"):
+        if os.path.isfile(path):
+            os.remove(path)
+
 def test_finally():
     """Delete the database."""
     delete_db()